@@ -115,7 +115,7 @@ function Setup-VirtualEnvironment {
     } else {
         # Instalar pacotes essenciais
         try {
-            pip install aiohttp aiofiles beautifulsoup4 requests urllib3 tqdm psutil diskcache | Out-Null
+            pip install aiohttp aiofiles beautifulsoup4 tqdm psutil diskcache orjson | Out-Null
             
             # Tentar instalar pacotes com componentes nativos (que podem falhar)
             try {
@@ -62,7 +62,7 @@ echo * Instalando dependencias
 if exist "requirements.txt" (
     pip install -r requirements.txt >nul 2>&1
 ) else (
-    pip install aiohttp aiofiles beautifulsoup4 requests urllib3 tqdm psutil diskcache lxml bs4 asyncio typing-extensions >nul 2>&1
+    pip install aiohttp aiofiles beautifulsoup4 tqdm psutil diskcache orjson lxml bs4 asyncio typing-extensions >nul 2>&1
 )
 
 :: Preparar diretório de cache
@@ -59,7 +59,7 @@ echo -e "• Instalando dependências"
 if [ -f "requirements.txt" ]; then
     pip install -r requirements.txt > /dev/null 2>&1
 else
-    pip install aiohttp aiofiles beautifulsoup4 requests urllib3 tqdm psutil diskcache lxml bs4 asyncio typing-extensions > /dev/null 2>&1
+    pip install aiohttp aiofiles beautifulsoup4 tqdm psutil diskcache orjson lxml bs4 asyncio typing-extensions > /dev/null 2>&1
 fi
 
 # Preparar diretório de cache
@@ -4,36 +4,61 @@
 import os
 import re
 import time
-import json
 import logging
+import logging.handlers
 import argparse
 import urllib.parse
 import asyncio
 import aiohttp
 import concurrent.futures
+import multiprocessing
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Optional, Union, Any, Generator, Callable
+from queue import SimpleQueue
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Set, Tuple, Optional, Union, Any, Generator, Iterator, Callable
 from dataclasses import dataclass, field
 from functools import lru_cache, wraps
+from operator import itemgetter
 from contextlib import asynccontextmanager, contextmanager
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
 
-import requests
 from bs4 import BeautifulSoup
-from tqdm.asyncio import tqdm as async_tqdm
 from tqdm import tqdm
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
 import diskcache
-import hashlib
+import orjson
+import gc
+import html
+import itertools
+import pickle
+import shutil
 import psutil
 import aiofiles
 import signal
+import threading
 import sys
 import weakref
 import traceback
 import uuid
+import zlib
+import zipfile
+
+try:
+    import aiodns  # noqa: F401 - habilita aiohttp.AsyncResolver
+    HAS_AIODNS = True
+except ImportError:
+    HAS_AIODNS = False
+
+try:
+    import uvloop  # opcional; não existe no Windows
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
+
+try:
+    import zstandard  # opcional; sem ele o cache de snapshots usa zlib
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
 
 logging.basicConfig(
     level=logging.INFO,
@@ -45,23 +70,148 @@ logging.basicConfig(
 )
 logger = logging.getLogger("kali_archive")
 
+def start_log_listener() -> logging.handlers.QueueListener:
+    # Escrita no arquivo e no console sai do event loop: os handlers configurados acima
+    # passam a rodar numa thread dedicada, alimentada por uma fila sem limite
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    log_queue: SimpleQueue = SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
 DEFAULT_DOMAIN = "ragezone.com.br"
 WAYBACK_CDX_URL = "https://web.archive.org/cdx/search/cdx"
 WAYBACK_URL_PREFIX = "https://web.archive.org/web/"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 MAX_RETRIES = 5
 RETRY_BACKOFF = 0.5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
 MAX_WORKERS = 12
 DOWNLOAD_DELAY = 0.5
+# Requisições de download (snapshots e recursos) por segundo, somando todas as tarefas
+DOWNLOAD_RATE_LIMIT = 10
 CACHE_DIR = ".kali_cache"
+# Listagens do CDX mudam pouco: reexecuções reaproveitam as páginas em cache por este período
+CDX_CACHE_TTL_HOURS = 24
+# HTML comprime bem: o corpo dos snapshots vai comprimido para o cache, com um prefixo
+# identificando o formato (entradas antigas, sem prefixo, continuam legíveis)
+CACHE_ZSTD_MAGIC = b"ZSTD"
+CACHE_ZLIB_MAGIC = b"ZLIB"
+CACHE_ZSTD_LEVEL = 3
+CACHE_ZLIB_LEVEL = 1
 MAX_SNAPSHOTS_PER_PAGE = 500
+# Consultas ao CDX correm junto com os downloads (mesmo host): poucas em paralelo evitam throttling
+CDX_CONCURRENCY = 4
+METADATA_READ_CONCURRENCY = 64
 MEMORY_LIMIT_PERCENT = 85
+MEMORY_SAMPLE_INTERVAL = 1.0
+MEMORY_BACKOFF_SECONDS = 5
+GC_THRESHOLDS = (10_000, 50, 50)
 CONN_LIMIT = 50
 REQUEST_TIMEOUT = 30
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PARTIAL_SUFFIX = ".part"
+CACHE_MAX_RESOURCE_SIZE = 5 * 1024 * 1024
+# O índice é gerado em milhares de pedaços pequenos: buffer grande reduz as escritas no disco
+INDEX_WRITE_BUFFER = 1024 * 1024
+# Compressão leve no pacote final: imagens e demais recursos já vêm comprimidos
+ZIP_COMPRESS_LEVEL = 3
+# Todo o tráfego vai para web.archive.org, cujo IP muda raramente: cache DNS longo é seguro
+DNS_CACHE_TTL = 3600
 FIXED_FALLBACK_DATE = "20000101"
 DYNAMIC_FALLBACK_YEARS = 5
+# forkserver: os processos de parsing nascem de um servidor limpo, sem herdar as threads
+# (log, executor) nem a memória do processo principal; onde não existe, o padrão da plataforma
+PARSE_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
 
-@dataclass
+# Atributos que referenciam recursos, por tag (<link> apenas com rel em LINK_REL_VALUES)
+RESOURCE_TAG_ATTRS: Dict[str, Tuple[str, ...]] = {
+    "link": ("href",),
+    "script": ("src",),
+    "img": ("src", "srcset"),
+    "a": ("href",),
+    "source": ("srcset",),
+    "video": ("src",),
+    "audio": ("src",),
+}
+LINK_REL_VALUES = ["stylesheet"]
+
+# Classificação de recursos: a extensão do caminho tem precedência; sem extensão conhecida, vale a tag
+RESOURCE_TAG_TYPES = {"link": "css", "script": "js", "img": "images"}
+RESOURCE_EXT_TYPES = {
+    **dict.fromkeys((".css", ".scss", ".less"), "css"),
+    **dict.fromkeys((".js", ".jsx", ".ts", ".tsx"), "js"),
+    **dict.fromkeys((".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".bmp", ".ico"), "images"),
+    **dict.fromkeys((".woff", ".woff2", ".ttf", ".otf", ".eot"), "fonts"),
+}
+
+UNSAFE_FILENAME_RE = re.compile(r'[\\/*?:"<>|]')
+URL_SCHEME_RE = re.compile(r'^https?:\/\/')
+# Prefixos testados com str.startswith (mais rápido que regex para prefixos fixos)
+ABSOLUTE_URL_PREFIXES = ("http://", "https://")
+SKIPPED_URL_PREFIXES = ("data:", "javascript:", "#", "mailto:")
+
+# Formatos de data aceitos na linha de comando, compilados uma única vez
+DATE_PATTERNS = (
+    (re.compile(r'^\d{8}$'), lambda m: m.group(0)),  # YYYYMMDD
+    (re.compile(r'^(\d{4})-(\d{2})-(\d{2})$'), lambda m: f"{m.group(1)}{m.group(2)}{m.group(3)}"),  # YYYY-MM-DD
+    (re.compile(r'^(\d{2})/(\d{2})/(\d{4})$'), lambda m: f"{m.group(3)}{m.group(2)}{m.group(1)}"),  # DD/MM/YYYY
+    (re.compile(r'^(\d{2})-(\d{2})-(\d{4})$'), lambda m: f"{m.group(3)}{m.group(2)}{m.group(1)}"),  # DD-MM-YYYY
+    (re.compile(r'^(\d{4})/(\d{2})/(\d{2})$'), lambda m: f"{m.group(1)}{m.group(2)}{m.group(3)}"),  # YYYY/MM/DD
+)
+DATE_FALLBACK_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%Y/%m/%d", "%d.%m.%Y", "%Y.%m.%d")
+RELATIVE_DATE_OFFSETS = {
+    **dict.fromkeys(("hoje", "today"), timedelta(0)),
+    **dict.fromkeys(("ontem", "yesterday"), timedelta(days=1)),
+    **dict.fromkeys(("semana_passada", "last_week"), timedelta(weeks=1)),
+    **dict.fromkeys(("mes_passado", "last_month"), timedelta(days=30)),
+    **dict.fromkeys(("ano_passado", "last_year"), timedelta(days=365)),
+}
+
+# __slots__ nos registros criados aos milhares (sem __dict__ por instância); o
+# parâmetro slots do dataclass só existe a partir do Python 3.10
+DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# URLs e bases se repetem muito entre snapshots e recursos; resultados são imutáveis
+cached_urlparse = lru_cache(maxsize=4096)(urllib.parse.urlparse)
+cached_urljoin = lru_cache(maxsize=4096)(urllib.parse.urljoin)
+
+@lru_cache(maxsize=16384)
+def url_netloc(url: str) -> str:
+    # Só o host interessa no filtro de domínio: urlsplit dispensa o campo params
+    # e o cache guarda uma string em vez da tupla inteira
+    return urllib.parse.urlsplit(url).netloc
+
+# Compressores zstd não podem ser usados por duas threads ao mesmo tempo: um por thread
+_zstd_local = threading.local()
+
+def compress_cache_body(data: bytes) -> bytes:
+    if HAS_ZSTD:
+        compressor = getattr(_zstd_local, "compressor", None)
+        if compressor is None:
+            compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=CACHE_ZSTD_LEVEL)
+        return CACHE_ZSTD_MAGIC + compressor.compress(data)
+    return CACHE_ZLIB_MAGIC + zlib.compress(data, CACHE_ZLIB_LEVEL)
+
+def decompress_cache_body(blob: bytes) -> Optional[bytes]:
+    magic = blob[:4]
+    if magic == CACHE_ZLIB_MAGIC:
+        return zlib.decompress(memoryview(blob)[4:])
+    if magic == CACHE_ZSTD_MAGIC:
+        if not HAS_ZSTD:
+            # Gravado por uma instalação com zstandard: tratado como ausente no cache
+            return None
+        decompressor = getattr(_zstd_local, "decompressor", None)
+        if decompressor is None:
+            decompressor = _zstd_local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(memoryview(blob)[4:])
+    return blob
+
+@dataclass(eq=False, **DATACLASS_SLOTS)
 class Snapshot:
     timestamp: str
     original_url: str
@@ -70,16 +220,8 @@ class Snapshot:
     digest: Optional[str] = None
     content: Optional[bytes] = None
     processed: bool = False
-    
-    def __hash__(self):
-        return hash((self.timestamp, self.original_url))
-    
-    def __eq__(self, other):
-        if not isinstance(other, Snapshot):
-            return False
-        return (self.timestamp, self.original_url) == (other.timestamp, other.original_url)
 
-@dataclass
+@dataclass(eq=False, **DATACLASS_SLOTS)
 class ResourceInfo:
     url: str
     type: str
@@ -88,14 +230,6 @@ class ResourceInfo:
     timestamp: str
     local_path: Optional[str] = None
     downloaded: bool = False
-    
-    def __hash__(self):
-        return hash((self.url, self.timestamp))
-    
-    def __eq__(self, other):
-        if not isinstance(other, ResourceInfo):
-            return False
-        return (self.url, self.timestamp) == (other.url, other.timestamp)
 
 @dataclass
 class MemoryStats:
@@ -117,53 +251,101 @@ class MemoryStats:
                 f"Snapshots: {self.snapshots_processed}, "
                 f"Recursos: {self.resources_processed}")
 
+_memory_sample = {"percent": 0.0, "checked_at": float("-inf")}
+
+def current_memory_percent() -> float:
+    # psutil.virtual_memory() não é barato: reaproveita a leitura por MEMORY_SAMPLE_INTERVAL
+    now = time.monotonic()
+    if now - _memory_sample["checked_at"] >= MEMORY_SAMPLE_INTERVAL:
+        _memory_sample["percent"] = psutil.virtual_memory().percent
+        _memory_sample["checked_at"] = now
+    return _memory_sample["percent"]
+
+def _log_gc_collection(phase: str, info: Dict[str, Any]) -> None:
+    # Apenas registra coletas completas; nunca força coleta
+    if phase == "stop" and info.get("generation") == 2:
+        logger.debug(f"GC geração 2: {info.get('collected', 0)} objetos coletados")
+
+def configure_gc() -> None:
+    # Workload dominado por downloads aloca muitos objetos de vida curta: menos coletas da geração 0
+    gc.set_threshold(*GC_THRESHOLDS)
+    if _log_gc_collection not in gc.callbacks:
+        gc.callbacks.append(_log_gc_collection)
+    # Módulos, classes e constantes carregados até aqui vivem a execução inteira:
+    # congelados, deixam de ser percorridos a cada coleta
+    gc.freeze()
+
 def memory_safe(threshold: float = MEMORY_LIMIT_PERCENT):
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            memory = psutil.virtual_memory()
-            if memory.percent >= threshold:
-                logger.warning(f"Alto uso de memória detectado: {memory.percent}%. Pausando operação...")
-                
-                # Força coleta de lixo
-                import gc
-                gc.collect()
-                
-                # Aguarda até que a memória esteja abaixo do limite
-                while psutil.virtual_memory().percent >= threshold - 5:
-                    await asyncio.sleep(1)
-                    gc.collect()
-                
-                logger.info(f"Uso de memória normalizado: {psutil.virtual_memory().percent}%. Retomando operação.")
+            memory_percent = current_memory_percent()
+            if memory_percent >= threshold:
+                # Uma única pausa, sem espera ativa nem coleta forçada
+                logger.warning(f"Alto uso de memória detectado: {memory_percent}%. Pausando operação por {MEMORY_BACKOFF_SECONDS}s...")
+                await asyncio.sleep(MEMORY_BACKOFF_SECONDS)
             
             return await func(*args, **kwargs)
         return wrapper
     return decorator
 
-def create_session() -> requests.Session:
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=MAX_RETRIES,
-        backoff_factor=RETRY_BACKOFF,
-        status_forcelist=[429, 500, 502, 503, 504],
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    session.headers.update({"User-Agent": USER_AGENT})
-    return session
-
 @asynccontextmanager
-async def create_async_session() -> aiohttp.ClientSession:
-    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
-    connector = aiohttp.TCPConnector(limit=CONN_LIMIT, limit_per_host=10, ttl_dns_cache=300)
+async def create_async_session(timeout: int = REQUEST_TIMEOUT,
+                               limit_per_host: int = 10) -> aiohttp.ClientSession:
+    # Sem limite total: downloads grandes em streaming não são interrompidos enquanto houver
+    # progresso; conexão e leituras paradas falham após `timeout` segundos
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+    # Todo o tráfego vai para web.archive.org: o limite por host é o limite efetivo
+    connector = aiohttp.TCPConnector(
+        limit=max(CONN_LIMIT, limit_per_host),
+        limit_per_host=limit_per_host,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        use_dns_cache=True,
+        resolver=aiohttp.AsyncResolver() if HAS_AIODNS else None
+    )
     async with aiohttp.ClientSession(
         connector=connector,
-        timeout=timeout,
+        timeout=client_timeout,
         headers={"User-Agent": USER_AGENT}
     ) as session:
         yield session
 
+@asynccontextmanager
+async def use_async_session(session: Optional[aiohttp.ClientSession] = None) -> aiohttp.ClientSession:
+    # Reutiliza a sessão compartilhada quando disponível; caso contrário cria uma temporária
+    if session is not None:
+        yield session
+    else:
+        async with create_async_session() as new_session:
+            yield new_session
+
+async def retry_get_json(session: aiohttp.ClientSession,
+                         url: str,
+                         params: Optional[Union[Dict[str, Any], List[Tuple[str, Any]]]] = None,
+                         max_retries: int = MAX_RETRIES) -> Tuple[int, Any]:
+    # Backoff exponencial para throttling e falhas transitórias (substitui o Retry do urllib3)
+    for attempt in range(max_retries):
+        last_attempt = attempt == max_retries - 1
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    # orjson direto sobre os bytes: sem decodificação para str nem json da stdlib;
+                    # corpo vazio (período sem capturas) ou inválido vale None, como em response.json()
+                    body = await response.read()
+                    if not body.strip():
+                        return response.status, None
+                    try:
+                        return response.status, orjson.loads(body)
+                    except orjson.JSONDecodeError:
+                        return response.status, None
+                if last_attempt or response.status not in RETRY_STATUS_CODES:
+                    return response.status, None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if last_attempt:
+                raise
+        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+    return 0, None
+
 @contextmanager
 def timing(operation: str):
     start_time = time.time()
@@ -186,6 +368,48 @@ def is_disk_space_ok(path: str, required_gb: float = 5.0) -> bool:
         logger.warning(f"Não foi possível verificar o espaço em disco: {e}")
         return True
 
+def partial_path(path: Path) -> Path:
+    # Gravação em arquivo temporário ao lado do destino e troca atômica ao final: um arquivo
+    # interrompido nunca ocupa o caminho final, que as verificações de retomada tomam por completo
+    return path.with_name(f"{path.name}{PARTIAL_SUFFIX}")
+
+def discard_partial(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+def write_bytes_atomic(path: Path, data: bytes) -> None:
+    tmp_path = partial_path(path)
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    finally:
+        discard_partial(tmp_path)
+
+def copy_file_atomic(source_path: Path, path: Path) -> None:
+    tmp_path = partial_path(path)
+    try:
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        discard_partial(tmp_path)
+
+def write_zip_archive(source_dir: Path, zip_path: Path) -> int:
+    # Caminhos relativos ao diretório de saída: os links do índice continuam válidos ao extrair
+    count = 0
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=ZIP_COMPRESS_LEVEL) as zf:
+        for root, _, files in os.walk(source_dir):
+            for name in files:
+                # Sobras de gravações interrompidas não fazem parte do acervo
+                if name.endswith(PARTIAL_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                zf.write(path, os.path.relpath(path, source_dir))
+                count += 1
+    return count
+
 def setup_signal_handlers(cleanup_func: Callable):
     def signal_handler(sig, frame):
         logger.info("Interrupção detectada. Encerrando graciosamente...")
@@ -196,41 +420,33 @@ def setup_signal_handlers(cleanup_func: Callable):
     signal.signal(signal.SIGTERM, signal_handler)
 
 class DomainDateDetector:
-    def __init__(self, domain: str, session: Optional[requests.Session] = None):
+    def __init__(self, 
+                domain: str, 
+                session: Optional[aiohttp.ClientSession] = None):
         self.domain = domain
-        self.session = session or create_session()
+        self.session = session
+        self.earliest_snapshot: Optional[Snapshot] = None
     
     async def detect_earliest_date(self) -> Optional[str]:
-        try:
-            params = {
-                "url": f"{self.domain}/*",
-                "output": "json",
-                "fl": "timestamp",
-                "limit": 1,
-                "sort": "timestamp:asc"
-            }
-            
-            async with create_async_session() as session:
-                async with session.get(WAYBACK_CDX_URL, params=params) as response:
-                    if response.status != 200:
-                        logger.warning(f"Falha ao detectar data inicial: status {response.status}")
-                        return None
-                    
-                    data = await response.json()
-                    if not data or len(data) <= 1:
-                        logger.warning("Nenhum snapshot encontrado para o domínio")
-                        return None
-                    
-                    # Formato dos dados: [["timestamp"], ["20010203123456"], ...]
-                    timestamp = data[1][0]
-                    if timestamp and len(timestamp) >= 8:
-                        logger.info(f"Data inicial do domínio detectada: {timestamp[:8]}")
-                        return timestamp[:8]
-                    
-                    return None
-        except Exception as e:
-            logger.error(f"Erro ao detectar data inicial: {e}")
+        # Usa a mesma consulta CDX da busca principal para que a linha retornada
+        # seja reaproveitada como snapshot (ver earliest_snapshot)
+        fetcher = SnapshotFetcher(self.domain, session=self.session)
+        snapshots = await fetcher._fetch_snapshot_batch(limit=1, sort="timestamp:asc", html_only=False)
+        
+        if not snapshots:
+            logger.warning("Nenhum snapshot encontrado para o domínio")
             return None
+        
+        earliest = snapshots[0]
+        if "text/html" in earliest.mimetype:
+            self.earliest_snapshot = earliest
+        
+        timestamp = earliest.timestamp
+        if timestamp and len(timestamp) >= 8:
+            logger.info(f"Data inicial do domínio detectada: {timestamp[:8]}")
+            return timestamp[:8]
+        
+        return None
     
     def get_dynamic_fallback_date(self) -> str:
         today = datetime.now()
@@ -255,60 +471,65 @@ class DomainDateDetector:
         
         return dynamic_fallback
 
+class RateLimiter:
+    def __init__(self, rate: float = DOWNLOAD_RATE_LIMIT):
+        # Espaça o início das requisições em 1/rate segundos, qualquer que seja a concorrência;
+        # cada chamada reserva o próximo horário livre (o event loop é single-thread: sem lock)
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+    
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
 class ResourceManager:
     def __init__(self, 
                 output_dir: Path,
                 domain: str,
                 cache: Optional[diskcache.Cache] = None,
-                max_workers: int = MAX_WORKERS):
+                max_workers: int = MAX_WORKERS,
+                session: Optional[aiohttp.ClientSession] = None,
+                rate_limiter: Optional[RateLimiter] = None):
         self.output_dir = output_dir
         self.domain = domain
         self.cache = cache
         self.max_workers = max_workers
+        self.session = session
+        self.rate_limiter = rate_limiter or RateLimiter()
         
         self.resources_dir = output_dir / "resources"
-        self.processed_urls: Set[str] = set()
-        self.resource_queue: Set[ResourceInfo] = set()
+        self.resource_queue: Dict[Tuple[str, str], ResourceInfo] = {}
         
         # Criar diretórios de recursos
         for resource_type in ["css", "js", "images", "fonts", "other"]:
             (self.resources_dir / resource_type).mkdir(parents=True, exist_ok=True)
     
     def add_resource(self, resource: ResourceInfo) -> None:
-        self.resource_queue.add(resource)
-    
-    def clear_processed_urls(self) -> None:
-        self.processed_urls.clear()
-    
-    def is_url_processed(self, url: str) -> bool:
-        return url in self.processed_urls
-    
-    def mark_url_processed(self, url: str) -> None:
-        self.processed_urls.add(url)
+        self.resource_queue.setdefault((resource.url, resource.timestamp), resource)
     
     @staticmethod
     def determine_resource_type(url: str, tag_name: str) -> str:
-        url_lower = url.lower()
-        
-        if tag_name == "link" or url_lower.endswith((".css", ".scss", ".less")):
-            return "css"
-        elif tag_name == "script" or url_lower.endswith((".js", ".jsx", ".ts", ".tsx")):
-            return "js"
-        elif tag_name == "img" or url_lower.endswith((".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".bmp", ".ico")):
-            return "images"
-        elif url_lower.endswith((".woff", ".woff2", ".ttf", ".otf", ".eot")):
-            return "fonts"
-        else:
-            return "other"
+        ext = os.path.splitext(cached_urlparse(url).path)[1].lower()
+        ext_type = RESOURCE_EXT_TYPES.get(ext)
+        if ext_type:
+            return ext_type
+        
+        return RESOURCE_TAG_TYPES.get(tag_name, "other")
     
     @staticmethod
+    @lru_cache(maxsize=8192)
     def generate_safe_filename(url: str) -> str:
-        parsed = urllib.parse.urlparse(url)
+        parsed = cached_urlparse(url)
         path = parsed.path.strip("/")
         if not path:
             path = "index"
         
-        safe_filename = re.sub(r'[\\/*?:"<>|]', "_", path)
+        safe_filename = UNSAFE_FILENAME_RE.sub("_", path)
         safe_filename = safe_filename.replace('%', '_percent_')
         
         if len(safe_filename) > 120:
@@ -316,20 +537,46 @@ class ResourceManager:
             safe_filename = name_part[:115] + ext_part if ext_part else name_part[:120]
         
         if parsed.query:
-            query_hash = hashlib.md5(parsed.query.encode()).hexdigest()[:10]
+            # Hash apenas para diferenciar query strings no nome do arquivo: CRC32 basta
+            query_hash = f"{zlib.crc32(parsed.query.encode()):08x}"
             safe_filename = f"{safe_filename}_{query_hash}"
         
         return safe_filename
     
+    @staticmethod
+    def build_local_resource_path(url: str, resource_type: str, timestamp: str) -> str:
+        safe_filename = ResourceManager.generate_safe_filename(url)
+        return f"../resources/{resource_type}/{timestamp}_{safe_filename}"
+    
     def get_local_resource_path(self, resource: ResourceInfo) -> str:
+        return self.build_local_resource_path(resource.url, resource.type, resource.timestamp)
+    
+    def get_resource_file_path(self, resource: ResourceInfo) -> Path:
         safe_filename = self.generate_safe_filename(resource.url)
-        return f"../resources/{resource.type}/{resource.timestamp}_{safe_filename}"
+        return self.resources_dir / resource.type / f"{resource.timestamp}_{safe_filename}"
     
-    @lru_cache(maxsize=1024)
-    def _get_cached_response(self, url: str) -> Optional[bytes]:
+    def _copy_cached_response(self, url: str, file_path: Path) -> bool:
         if not self.cache:
-            return None
-        return self.cache.get(url)
+            return False
+        
+        # bytes já são gravados sem pickle pelo diskcache; com read=True, valores grandes
+        # voltam como arquivo aberto e são copiados sem carregar tudo em memória
+        cached = self.cache.get(url, read=True)
+        if not cached:
+            return False
+        
+        if isinstance(cached, bytes):
+            write_bytes_atomic(file_path, cached)
+            return True
+        
+        tmp_path = partial_path(file_path)
+        try:
+            with cached, open(tmp_path, "wb") as f:
+                shutil.copyfileobj(cached, f, DOWNLOAD_CHUNK_SIZE)
+            os.replace(tmp_path, file_path)
+        finally:
+            discard_partial(tmp_path)
+        return True
 
     def _set_cached_response(self, url: str, content: bytes) -> None:
         if self.cache:
@@ -337,36 +584,34 @@ class ResourceManager:
     
     @memory_safe()
     async def download_resource(self, resource: ResourceInfo) -> bool:
-        if resource.url in self.processed_urls:
+        # Recurso já baixado em execução anterior: evita cache e rede
+        file_path = self.get_resource_file_path(resource)
+        if file_path.exists() and file_path.stat().st_size > 0:
+            resource.local_path = str(file_path)
+            resource.downloaded = True
             return True
         
-        self.processed_urls.add(resource.url)
-        
         try:
-            if resource.url.startswith(("http://", "https://")):
+            if resource.url.startswith(ABSOLUTE_URL_PREFIXES):
                 wayback_url = f"{WAYBACK_URL_PREFIX}{resource.timestamp}id_/{resource.url}"
             else:
                 base_url = f"http://{self.domain}"
-                full_url = urllib.parse.urljoin(base_url, resource.url)
+                full_url = cached_urljoin(base_url, resource.url)
                 wayback_url = f"{WAYBACK_URL_PREFIX}{resource.timestamp}id_/{full_url}"
             
             cache_key = f"resource_{resource.url}_{resource.timestamp}"
             
             if self.cache:
-                cached_content = self._get_cached_response(cache_key)
-                if cached_content:
-                    safe_filename = self.generate_safe_filename(resource.url)
-                    file_path = self.resources_dir / resource.type / f"{resource.timestamp}_{safe_filename}"
-                    
-                    async with aiofiles.open(file_path, "wb") as f:
-                        await f.write(cached_content)
+                loop = asyncio.get_running_loop()
+                if await loop.run_in_executor(None, self._copy_cached_response, cache_key, file_path):
                     return True
             
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    async with create_async_session() as session:
-                        async with session.get(wayback_url, timeout=REQUEST_TIMEOUT) as response:
+                    await self.rate_limiter.wait()
+                    async with use_async_session(self.session) as session:
+                        async with session.get(wayback_url) as response:
                             if response.status != 200:
                                 if response.status in (429, 503, 504):
                                     wait_time = DOWNLOAD_DELAY * (2 ** attempt)
@@ -374,24 +619,35 @@ class ResourceManager:
                                     continue
                                 return False
                             
-                            content = await response.read()
-                            
-                            if self.cache:
-                                self._set_cached_response(cache_key, content)
+                            # Gravar em blocos direto no disco; só recursos pequenos e de tamanho
+                            # conhecido são mantidos em memória para o cache
+                            content_length = response.content_length
+                            cacheable = (self.cache is not None and content_length is not None
+                                         and content_length <= CACHE_MAX_RESOURCE_SIZE)
+                            chunks = []
                             
-                            safe_filename = self.generate_safe_filename(resource.url)
-                            file_path = self.resources_dir / resource.type / f"{resource.timestamp}_{safe_filename}"
+                            # Streaming para o arquivo temporário; qualquer interrupção (erro de
+                            # rede, cancelamento) o descarta e o caminho final nunca fica truncado
+                            tmp_path = partial_path(file_path)
+                            try:
+                                async with aiofiles.open(tmp_path, "wb") as f:
+                                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                                        await f.write(chunk)
+                                        if cacheable:
+                                            chunks.append(chunk)
+                                os.replace(tmp_path, file_path)
+                            finally:
+                                discard_partial(tmp_path)
                             
-                            async with aiofiles.open(file_path, "wb") as f:
-                                await f.write(content)
+                            if cacheable:
+                                self._set_cached_response(cache_key, b"".join(chunks))
                             
                             resource.local_path = str(file_path)
                             resource.downloaded = True
-                            
-                            await asyncio.sleep(DOWNLOAD_DELAY)
                             return True
-                except (aiohttp.ClientError, asyncio.TimeoutError):
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                     wait_time = DOWNLOAD_DELAY * (2 ** attempt)
+                    logger.debug(f"Erro de conexão em {resource.url}: {e!r}. Tentando novamente em {wait_time}s...")
                     await asyncio.sleep(wait_time)
             
             return False
@@ -399,33 +655,79 @@ class ResourceManager:
             logger.error(f"Erro ao baixar recurso {resource.url}: {str(e)}")
             return False
     
+    def _link_resource_copies(self, source: ResourceInfo, copies: List[ResourceInfo]) -> None:
+        source_path = self.get_resource_file_path(source)
+        for resource in copies:
+            file_path = self.get_resource_file_path(resource)
+            if not file_path.exists():
+                try:
+                    os.link(source_path, file_path)
+                except OSError:
+                    copy_file_atomic(source_path, file_path)
+            resource.local_path = str(file_path)
+            resource.downloaded = True
+    
     @memory_safe()
     async def download_all_resources(self, stats: MemoryStats) -> None:
         if not self.resource_queue:
             logger.info("Nenhum recurso para baixar")
             return
         
-        logger.info(f"Iniciando download de {len(self.resource_queue)} recursos...")
+        # Uma requisição por URL, decidida antes do despacho: as demais capturas do mesmo
+        # recurso recebem um hardlink do arquivo baixado, no caminho que o seu HTML referencia
+        resources_by_url: Dict[str, List[ResourceInfo]] = defaultdict(list)
+        for resource in self.resource_queue.values():
+            resources_by_url[resource.url].append(resource)
         
-        semaphore = asyncio.Semaphore(self.max_workers)
+        logger.info(f"Iniciando download de {len(resources_by_url)} recursos "
+                    f"({len(self.resource_queue)} referências)...")
         
-        async def download_with_semaphore(resource):
-            async with semaphore:
-                result = await self.download_resource(resource)
-                if result:
-                    stats.resources_processed += 1
-                    if stats.resources_processed % 100 == 0:
-                        stats.update()
-                        logger.info(f"Progresso: {stats.resources_processed}/{len(self.resource_queue)} recursos | {stats}")
-                return result
+        total = len(resources_by_url)
+        success_count = 0
+        loop = asyncio.get_running_loop()
         
-        tasks = [download_with_semaphore(resource) for resource in self.resource_queue]
+        # Pool fixo de workers consumindo uma fila limitada: memória O(max_workers),
+        # em vez de uma corrotina por recurso criada de uma só vez
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_workers * 2)
         
-        with timing("Download de recursos"):
-            results = await async_tqdm.gather(*tasks, desc="Baixando recursos", total=len(self.resource_queue))
+        async def worker(progress):
+            nonlocal success_count
+            while True:
+                group = await queue.get()
+                try:
+                    if group is None:
+                        return
+                    if await self.download_resource(group[0]):
+                        if len(group) > 1:
+                            try:
+                                await loop.run_in_executor(None, self._link_resource_copies, group[0], group[1:])
+                            except OSError as e:
+                                logger.warning(f"Erro ao replicar recurso {group[0].url}: {e}")
+                        success_count += 1
+                        stats.resources_processed += 1
+                        if stats.resources_processed % 100 == 0:
+                            stats.update()
+                            logger.info(f"Progresso: {stats.resources_processed}/{total} recursos | {stats}")
+                except Exception as e:
+                    # Um worker que morre em silêncio deixa a fila limitada sem consumidores
+                    # e o despacho bloqueado em queue.put
+                    logger.error(f"Erro ao baixar recurso {group[0].url}: {e}")
+                finally:
+                    if group is not None:
+                        progress.update(1)
+                    queue.task_done()
+        
+        with timing("Download de recursos"), tqdm(total=total, desc="Baixando recursos") as progress:
+            workers = [asyncio.create_task(worker(progress)) for _ in range(self.max_workers)]
+            
+            for group in resources_by_url.values():
+                await queue.put(group)
+            for _ in workers:
+                await queue.put(None)
+            
+            await asyncio.gather(*workers)
         
-        success_count = sum(1 for r in results if r)
-        logger.info(f"Download de recursos concluído: {success_count}/{len(self.resource_queue)} ({success_count/len(self.resource_queue)*100:.1f}%)")
+        logger.info(f"Download de recursos concluído: {success_count}/{total} ({success_count/total*100:.1f}%)")
         
         self.resource_queue.clear()
 
@@ -436,13 +738,24 @@ class SnapshotFetcher:
                 end_date: Optional[str] = None,
                 max_snapshots: Optional[int] = None,
                 all_versions: bool = True,
-                memory_safe: bool = True):
+                memory_safe: bool = True,
+                session: Optional[aiohttp.ClientSession] = None,
+                seed_snapshots: Optional[List[Snapshot]] = None,
+                cache: Optional[diskcache.Cache] = None,
+                cdx_ttl_hours: int = CDX_CACHE_TTL_HOURS,
+                rate_limiter: Optional[RateLimiter] = None):
         self.domain = domain
         self.start_date = start_date
         self.end_date = end_date
         self.max_snapshots = max_snapshots
         self.all_versions = all_versions
         self.memory_safe = memory_safe
+        self.session = session
+        self.seed_snapshots = seed_snapshots or []
+        self.cache = cache if cdx_ttl_hours > 0 else None
+        self.cdx_ttl = cdx_ttl_hours * 3600
+        self._cdx_cache_hit_logged = False
+        self.rate_limiter = rate_limiter or RateLimiter()
     
     @staticmethod
     def _split_date_range(start_date: str, end_date: str) -> List[Tuple[str, str]]:
@@ -469,49 +782,85 @@ class SnapshotFetcher:
             logger.error(f"Erro ao dividir intervalo de datas: {e}")
             return [(start_date, end_date)]
     
-    @staticmethod
-    def _deduplicate_snapshots(snapshots: List[Snapshot]) -> List[Snapshot]:
-        seen = set()
-        unique = []
-        
-        for snapshot in snapshots:
-            key = f"{snapshot.original_url}_{snapshot.timestamp}"
-            if key not in seen:
-                seen.add(key)
-                unique.append(snapshot)
-        
-        return unique
+    async def _get_cdx_page(self, session: aiohttp.ClientSession, params: Dict[str, Any]) -> Tuple[int, Any]:
+        # Parâmetros com lista (vários filtros) viram pares repetidos na query string
+        query = [(key, item) for key, value in params.items()
+                 for item in (value if isinstance(value, list) else (value,))]
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = f"cdx_{urllib.parse.urlencode(sorted(query))}"
+            # Leitura e escrita no cache (SQLite) fora do event loop, como o registro de digests
+            loop = asyncio.get_running_loop()
+            cached = await loop.run_in_executor(None, self.cache.get, cache_key)
+            if cached is not None:
+                if not self._cdx_cache_hit_logged:
+                    self._cdx_cache_hit_logged = True
+                    logger.info(f"Usando listagens do CDX em cache (até {self.cdx_ttl // 3600}h); "
+                                f"apague {CACHE_DIR} ou use --cdx-ttl 0 para atualizar")
+                return 200, cached
+        
+        status, data = await retry_get_json(session, WAYBACK_CDX_URL, params=query)
+        if cache_key and status == 200:
+            # Janelas sem capturas também vão para o cache (como lista vazia): uma execução
+            # retomada não repete as consultas que nada retornaram
+            data = data or []
+            await loop.run_in_executor(None, self._set_cdx_page, cache_key, data)
+        return status, data
+    
+    def _set_cdx_page(self, cache_key: str, data: Any) -> None:
+        self.cache.set(cache_key, data, expire=self.cdx_ttl)
     
     async def _fetch_snapshot_batch(self, 
                                  collapse: Optional[str] = None, 
                                  from_date: Optional[str] = None, 
-                                 to_date: Optional[str] = None) -> List[Snapshot]:
+                                 to_date: Optional[str] = None,
+                                 limit: Optional[int] = None,
+                                 sort: Optional[str] = None,
+                                 html_only: bool = True) -> List[Snapshot]:
         params = {
             "url": self.domain + "/*",
             "output": "json",
             "fl": "timestamp,original,statuscode,mimetype,digest",
-            "filter": "statuscode:200",
-            "limit": MAX_SNAPSHOTS_PER_PAGE,
+            # Filtrar o tipo no servidor: linhas que não são HTML nem chegam a ser
+            # transferidas, decodificadas e guardadas no cache
+            "filter": ["statuscode:200", "mimetype:text/html"] if html_only else "statuscode:200",
+            "limit": limit or MAX_SNAPSHOTS_PER_PAGE,
         }
         
         if collapse:
             params["collapse"] = collapse
+        if sort:
+            params["sort"] = sort
         
         if from_date or self.start_date:
             params["from"] = from_date or self.start_date
         if to_date or self.end_date:
             params["to"] = to_date or self.end_date
         
+        # Consultas com limite explícito são pontuais e dispensam paginação
+        if not limit:
+            params["showResumeKey"] = "true"
+        
+        snapshots = []
         try:
-            async with create_async_session() as session:
-                async with session.get(WAYBACK_CDX_URL, params=params) as response:
-                    if response.status != 200:
-                        logger.error(f"Erro ao buscar snapshots: {response.status}")
-                        return []
+            async with use_async_session(self.session) as session:
+                # Paginação via resumeKey: cada página traz no máximo MAX_SNAPSHOTS_PER_PAGE linhas
+                while True:
+                    status, data = await self._get_cdx_page(session, params)
+                    if status != 200:
+                        logger.error(f"Erro ao buscar snapshots: {status}")
+                        return snapshots
                     
-                    data = await response.json()
                     if not data or len(data) <= 1:
-                        return []
+                        return snapshots
+                    
+                    # Com showResumeKey, a resposta termina com uma linha vazia seguida da chave
+                    resume_key = None
+                    rows = data[1:]
+                    if len(rows) >= 2 and not rows[-2] and rows[-1]:
+                        resume_key = rows[-1][0]
+                        rows = rows[:-2]
                     
                     headers = data[0]
                     timestamp_idx = headers.index("timestamp")
@@ -520,9 +869,8 @@ class SnapshotFetcher:
                     mimetype_idx = headers.index("mimetype")
                     digest_idx = headers.index("digest") if "digest" in headers else -1
                     
-                    snapshots = []
-                    for row in data[1:]:
-                        if "text/html" in row[mimetype_idx]:
+                    for row in rows:
+                        if not html_only or "text/html" in row[mimetype_idx]:
                             digest = row[digest_idx] if digest_idx >= 0 else None
                             snapshots.append(Snapshot(
                                 timestamp=row[timestamp_idx],
@@ -532,18 +880,26 @@ class SnapshotFetcher:
                                 digest=digest
                             ))
                     
-                    return snapshots
+                    if not resume_key:
+                        return snapshots
+                    
+                    if self.max_snapshots and len(snapshots) >= self.max_snapshots:
+                        return snapshots
+                    
+                    params["resumeKey"] = resume_key
         except Exception as e:
             logger.error(f"Erro ao buscar snapshots: {e}")
-            return []
+            return snapshots
     
-    async def fetch_all_snapshots(self) -> List[Snapshot]:
+    async def fetch_snapshots_stream(self) -> AsyncIterator[Snapshot]:
+        # Snapshots entregues período a período, já deduplicados, para que o processamento
+        # comece antes de a paginação do CDX terminar e o índice completo nunca fique em memória
         logger.info(f"Buscando snapshots para o domínio: {self.domain}")
         
-        all_snapshots = []
-        
         if not self.all_versions:
-            return await self._fetch_snapshot_batch(collapse="urlkey")
+            for snapshot in await self._fetch_snapshot_batch(collapse="urlkey"):
+                yield snapshot
+            return
         
         from_date = self.start_date if self.start_date else "19960101"
         to_date = self.end_date if self.end_date else datetime.now().strftime("%Y%m%d")
@@ -551,24 +907,74 @@ class SnapshotFetcher:
         date_ranges = self._split_date_range(from_date, to_date)
         logger.info(f"Dividindo busca em {len(date_ranges)} períodos para captura completa")
         
-        for start, end in date_ranges:
-            logger.info(f"Buscando snapshots no período: {start} a {end}")
+        seen: Set[Tuple[str, str]] = set()
+        
+        # Snapshots já obtidos na detecção da data inicial entram primeiro
+        for snapshot in self.seed_snapshots:
+            key = (snapshot.original_url, snapshot.timestamp)
+            if key not in seen:
+                seen.add(key)
+                yield snapshot
+        
+        async def fetch_range(start: str, end: str) -> List[Snapshot]:
             batch = await self._fetch_snapshot_batch(from_date=start, to_date=end)
             logger.info(f"Encontrados {len(batch)} snapshots no período {start} a {end}")
-            all_snapshots.extend(batch)
-            
-            if self.max_snapshots and len(all_snapshots) >= self.max_snapshots:
-                logger.info(f"Limite de snapshots atingido ({self.max_snapshots})")
-                break
-            
-            if self.memory_safe and not is_memory_ok():
-                logger.warning("Alto uso de memória detectado. Forçando coleta de lixo...")
-                import gc
-                gc.collect()
+            return batch
+        
+        # Janela deslizante de períodos: até CDX_CONCURRENCY consultas em paralelo (evita
+        # throttling do CDX), entregues em ordem cronológica; no máximo CDX_CONCURRENCY lotes
+        # ficam em memória enquanto o consumidor processa
+        ranges = iter(date_ranges)
+        pending: Deque[asyncio.Task] = deque(
+            asyncio.ensure_future(fetch_range(start, end))
+            for start, end in itertools.islice(ranges, CDX_CONCURRENCY)
+        )
+        try:
+            while pending:
+                batch = await pending.popleft()
+                next_range = next(ranges, None)
+                if next_range:
+                    pending.append(asyncio.ensure_future(fetch_range(*next_range)))
+                
+                for snapshot in batch:
+                    key = (snapshot.original_url, snapshot.timestamp)
+                    if key not in seen:
+                        seen.add(key)
+                        yield snapshot
+                del batch
+                
+                if self.memory_safe and not is_memory_ok():
+                    logger.warning("Alto uso de memória detectado. Forçando coleta de lixo...")
+                    gc.collect()
+        finally:
+            # Consumidor encerrou antes (ex.: limite de páginas): cancelar consultas em andamento
+            for task in pending:
+                task.cancel()
         
-        unique_snapshots = self._deduplicate_snapshots(all_snapshots)
-        logger.info(f"Total de snapshots únicos: {len(unique_snapshots)}")
-        return unique_snapshots
+        logger.info(f"Total de snapshots únicos: {len(seen)}")
+    
+    async def fetch_all_snapshots(self) -> List[Snapshot]:
+        snapshots = []
+        stream = self.fetch_snapshots_stream()
+        try:
+            async for snapshot in stream:
+                snapshots.append(snapshot)
+                if self.max_snapshots and len(snapshots) >= self.max_snapshots:
+                    logger.info(f"Limite de snapshots atingido ({self.max_snapshots})")
+                    break
+        finally:
+            await stream.aclose()
+        return snapshots
+    
+    @staticmethod
+    def _load_cached_body(cache: diskcache.Cache, cache_key: str) -> Optional[bytes]:
+        blob = cache.get(cache_key)
+        return decompress_cache_body(blob) if blob else None
+    
+    @staticmethod
+    def _store_cached_body(cache: diskcache.Cache, cache_key: str, content: bytes) -> None:
+        # Leitura do disco, descompressão e compressão fora do event loop
+        cache.set(cache_key, compress_cache_body(content))
     
     @memory_safe()
     async def download_snapshot(self, snapshot: Snapshot, cache: Optional[diskcache.Cache] = None) -> bool:
@@ -576,9 +982,10 @@ class SnapshotFetcher:
         original_url = snapshot.original_url
         
         cache_key = f"{original_url}_{timestamp}"
+        loop = asyncio.get_running_loop()
         
         if cache:
-            cached_content = cache.get(cache_key)
+            cached_content = await loop.run_in_executor(None, self._load_cached_body, cache, cache_key)
             if cached_content:
                 snapshot.content = cached_content
                 return True
@@ -590,8 +997,9 @@ class SnapshotFetcher:
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    async with create_async_session() as session:
-                        async with session.get(wayback_url, timeout=REQUEST_TIMEOUT) as response:
+                    await self.rate_limiter.wait()
+                    async with use_async_session(self.session) as session:
+                        async with session.get(wayback_url) as response:
                             if response.status != 200:
                                 logger.warning(f"Erro ao baixar {wayback_url}: {response.status}")
                                 if response.status in (429, 503, 504):
@@ -605,10 +1013,7 @@ class SnapshotFetcher:
                             snapshot.content = content
                             
                             if cache:
-                                cache.set(cache_key, content)
-                            
-                            # Pausa estratégica para evitar sobrecarga do servidor
-                            await asyncio.sleep(DOWNLOAD_DELAY)
+                                await loop.run_in_executor(None, self._store_cached_body, cache, cache_key, content)
                             return True
                 except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                     wait_time = DOWNLOAD_DELAY * (2 ** attempt)
@@ -621,14 +1026,106 @@ class SnapshotFetcher:
             logger.error(f"Erro ao baixar {wayback_url}: {e}")
             return False
 
+def _extract_all_resources(soup: BeautifulSoup,
+                           timestamp: str,
+                           base_url: str,
+                           domain: str) -> List[Tuple[str, str, str, str]]:
+    resources = []
+    
+    # Uma única travessia da árvore para todas as tags que referenciam recursos
+    for tag in soup.find_all(list(RESOURCE_TAG_ATTRS)):
+        tag_name = tag.name
+        
+        # Para tags <link>, verificar o atributo rel
+        if tag_name == "link":
+            if "rel" not in tag.attrs or not any(rel in tag["rel"] for rel in LINK_REL_VALUES):
+                continue
+        
+        for attr_name in RESOURCE_TAG_ATTRS[tag_name]:
+            if attr_name not in tag.attrs:
+                continue
+                
+            url = tag[attr_name]
+            
+            # Ignorar URLs em base64 ou data URI
+            if url.startswith(SKIPPED_URL_PREFIXES):
+                continue
+            
+            # Normalizar URL
+            if not url.startswith(ABSOLUTE_URL_PREFIXES):
+                url = cached_urljoin(base_url, url)
+            
+            # Processar apenas URLs absolutas ou relativas para o mesmo domínio
+            netloc = url_netloc(url)
+            if not netloc or domain not in netloc:
+                continue
+            
+            resource_type = ResourceManager.determine_resource_type(url, tag_name)
+            resources.append((url, resource_type, tag_name, attr_name))
+            
+            # Atualizar o atributo para apontar para o local salvo
+            tag[attr_name] = ResourceManager.build_local_resource_path(url, resource_type, timestamp)
+    
+    return resources
+
+def parse_html_extract(content: bytes,
+                       original_url: str,
+                       timestamp: str,
+                       domain: str) -> Tuple[bytes, List[Tuple[str, str, str, str]]]:
+    # Trabalho puramente de CPU, executado fora do event loop (ProcessPoolExecutor).
+    # Retorna o HTML reescrito e as tuplas (url, tipo, tag, atributo) dos recursos encontrados.
+    soup = BeautifulSoup(content, "lxml")
+    
+    # Criar base URL para resolução de links relativos
+    base_url = original_url
+    if base_url.startswith(ABSOLUTE_URL_PREFIXES):
+        base_parts = cached_urlparse(base_url)
+        base_url = f"{base_parts.scheme}://{base_parts.netloc}"
+    else:
+        base_url = f"http://{domain}"
+    
+    # Ajustar URLs relativas no HTML
+    base_rewritten = False
+    base_tag = soup.find("base")
+    if base_tag and "href" in base_tag.attrs:
+        base_href = base_tag["href"]
+        if not base_href.startswith(ABSOLUTE_URL_PREFIXES):
+            base_tag["href"] = cached_urljoin(base_url, base_href)
+            base_rewritten = True
+    
+    # Cada recurso extraído corresponde a um atributo reescrito; sem nenhum, o conteúdo
+    # original é gravado como está, sem serializar a árvore
+    resources = _extract_all_resources(soup, timestamp, base_url, domain)
+    html_bytes = soup.encode("utf-8") if resources or base_rewritten else content
+    
+    # A árvore tem referências cíclicas (pai <-> filhos): desmontá-la libera os nós por
+    # contagem de referências, sem deixar milhares de objetos para o coletor cíclico
+    soup.decompose()
+    
+    return html_bytes, resources
+
 class HtmlProcessor:
     def __init__(self, 
                 output_dir: Path,
                 domain: str,
-                resource_manager: ResourceManager):
+                resource_manager: ResourceManager,
+                executor: Optional[concurrent.futures.Executor] = None,
+                cache: Optional[diskcache.Cache] = None):
         self.output_dir = output_dir
         self.domain = domain
         self.resource_manager = resource_manager
+        self.executor = executor
+        self.cache = cache
+        # O mapa de digests também vai para o cache persistente, para valer entre execuções
+        # (chave por diretório de saída: hardlinks só fazem sentido dentro do mesmo arquivo)
+        self._digest_cache_prefix = f"digest_{output_dir.resolve()}_"
+        
+        # (url, digest) -> (HTML já gerado, metadados gravados): capturas idênticas não são
+        # reprocessadas; a lista de recursos fica só em disco e é relida quando necessária
+        self.processed_digests: Dict[Tuple[str, str], Tuple[Path, Path]] = {}
+        # (url, digest) -> evento da captura em download/parsing: capturas idênticas que chegam
+        # aos workers ao mesmo tempo esperam por ela em vez de baixar o mesmo conteúdo
+        self.inflight_digests: Dict[Tuple[str, str], asyncio.Event] = {}
         
         self.html_dir = output_dir / "html"
         self.metadata_dir = output_dir / "metadata"
@@ -637,6 +1134,178 @@ class HtmlProcessor:
         self.html_dir.mkdir(parents=True, exist_ok=True)
         self.metadata_dir.mkdir(parents=True, exist_ok=True)
     
+    def _get_snapshot_paths(self, snapshot: Snapshot) -> Tuple[str, Path, Path]:
+        # Gerar nome de arquivo seguro
+        safe_filename = ResourceManager.generate_safe_filename(snapshot.original_url)
+        version_path = f"{snapshot.timestamp}_{safe_filename}"
+        
+        # Definir caminho de arquivo
+        if safe_filename.endswith((".html", ".htm")):
+            file_path = self.html_dir / f"{version_path}"
+        else:
+            file_path = self.html_dir / f"{version_path}.html"
+        
+        return version_path, file_path, self.metadata_dir / f"{version_path}.json"
+    
+    def is_snapshot_processed(self, snapshot: Snapshot) -> bool:
+        # HTML e metadados gravados em execução anterior dispensam novo download e parsing
+        _, file_path, metadata_path = self._get_snapshot_paths(snapshot)
+        return (file_path.exists() and file_path.stat().st_size > 0
+                and metadata_path.exists() and metadata_path.stat().st_size > 0)
+    
+    @staticmethod
+    def _write_files(*files: Tuple[Path, bytes]) -> None:
+        # HTML antes dos metadados: metadados presentes marcam o snapshot como concluído
+        for path, data in files:
+            write_bytes_atomic(path, data)
+    
+    def _write_snapshot(self, file_path: Path, html_bytes: bytes, metadata_path: Path, metadata: bytes,
+                        digest_key: Optional[str]) -> None:
+        self._write_files((file_path, html_bytes), (metadata_path, metadata))
+        # Registro do digest no cache persistente (escrita no SQLite) na mesma ida à thread pool
+        if digest_key is not None:
+            self.cache.set(digest_key, (file_path.name, metadata_path.name))
+    
+    @staticmethod
+    def _link_and_write(source_path: Path, file_path: Path, metadata_path: Path, metadata: bytes) -> None:
+        if not file_path.exists():
+            try:
+                os.link(source_path, file_path)
+            except OSError:
+                copy_file_atomic(source_path, file_path)
+        write_bytes_atomic(metadata_path, metadata)
+    
+    @staticmethod
+    def _metadata_bytes(snapshot: Snapshot,
+                        version_path: str,
+                        file_path: Path,
+                        resources_meta: List[Dict[str, str]]) -> bytes:
+        metadata = {
+            "original_url": snapshot.original_url,
+            "wayback_timestamp": snapshot.timestamp,
+            "wayback_url": f"{WAYBACK_URL_PREFIX}{snapshot.timestamp}/{snapshot.original_url}",
+            "saved_path": str(file_path),
+            "extracted_date": datetime.now().isoformat(),
+            "version_path": version_path,
+            "resources": resources_meta
+        }
+        return orjson.dumps(metadata, option=orjson.OPT_INDENT_2)
+    
+    @staticmethod
+    def _read_metadata(metadata_path: Path) -> Dict[str, Any]:
+        return orjson.loads(metadata_path.read_bytes())
+    
+    def _load_canonical(self, key: Tuple[str, str]) -> Optional[Tuple[Path, Path]]:
+        # Captura idêntica processada em execução anterior: só vale se os arquivos ainda existem
+        names = self.cache.get(f"{self._digest_cache_prefix}{key[0]}_{key[1]}")
+        if not names:
+            return None
+        canonical = (self.html_dir / names[0], self.metadata_dir / names[1])
+        if not all(path.exists() for path in canonical):
+            return None
+        return canonical
+    
+    async def _find_canonical(self, key: Tuple[str, str]) -> Optional[Tuple[Path, Path]]:
+        canonical = self.processed_digests.get(key)
+        if canonical or self.cache is None:
+            return canonical
+        
+        # Leitura do SQLite e stat dos arquivos fora do event loop
+        loop = asyncio.get_running_loop()
+        canonical = await loop.run_in_executor(None, self._load_canonical, key)
+        if canonical:
+            self.processed_digests[key] = canonical
+        return canonical
+    
+    def _requeue_resources(self, metadata: Dict[str, Any]) -> List[Dict[str, str]]:
+        # Recolocar na fila os recursos de um HTML já gravado cobre uma execução anterior
+        # interrompida antes de baixá-los (já baixados são ignorados em download_resource,
+        # repetidos na fila são descartados)
+        resources_meta = metadata.get("resources", [])
+        timestamp = metadata.get("wayback_timestamp", "")
+        for resource in resources_meta:
+            self.resource_manager.add_resource(ResourceInfo(
+                url=resource["url"],
+                type=resource["type"],
+                tag=resource["tag"],
+                attr=resource["attr"],
+                timestamp=timestamp
+            ))
+        return resources_meta
+    
+    async def resume_snapshot(self, snapshot: Snapshot) -> bool:
+        if not self.is_snapshot_processed(snapshot):
+            return False
+        
+        _, file_path, metadata_path = self._get_snapshot_paths(snapshot)
+        try:
+            loop = asyncio.get_running_loop()
+            metadata = await loop.run_in_executor(None, self._read_metadata, metadata_path)
+        except Exception as e:
+            # Metadados ilegíveis: o snapshot é tratado como não processado e baixado de novo
+            logger.warning(f"Metadados inválidos em {metadata_path}: {e}")
+            return False
+        
+        self._requeue_resources(metadata)
+        # Capturas idênticas seguintes reaproveitam o HTML desta execução anterior
+        if snapshot.digest:
+            self.processed_digests[(snapshot.original_url, snapshot.digest)] = (file_path, metadata_path)
+        snapshot.processed = True
+        return True
+    
+    def claim_digest(self, snapshot: Snapshot) -> bool:
+        # Registra o snapshot como a captura canônica do seu digest antes do download;
+        # False se outra captura idêntica já está em andamento
+        if not snapshot.digest:
+            return True
+        key = (snapshot.original_url, snapshot.digest)
+        if key in self.inflight_digests:
+            return False
+        self.inflight_digests[key] = asyncio.Event()
+        return True
+    
+    def release_digest(self, snapshot: Snapshot) -> None:
+        # Chamado com o snapshot já gravado ou após falha: quem espera reaproveita o HTML
+        # pelo mapa de digests ou, sem ele, disputa o registro e baixa por conta própria
+        if not snapshot.digest:
+            return
+        pending = self.inflight_digests.pop((snapshot.original_url, snapshot.digest), None)
+        if pending is not None:
+            pending.set()
+    
+    async def process_duplicate(self, snapshot: Snapshot) -> bool:
+        # Mesmo digest do CDX = mesmo conteúdo: reaproveita o HTML já processado
+        # (hardlink, ou cópia se o sistema de arquivos não suportar) sem baixar de novo
+        if not snapshot.digest:
+            return False
+        
+        key = (snapshot.original_url, snapshot.digest)
+        pending = self.inflight_digests.get(key)
+        if pending is not None:
+            await pending.wait()
+        
+        canonical = await self._find_canonical(key)
+        if not canonical:
+            return False
+        
+        source_path, source_metadata_path = canonical
+        version_path, file_path, metadata_path = self._get_snapshot_paths(snapshot)
+        
+        try:
+            loop = asyncio.get_running_loop()
+            source_metadata = await loop.run_in_executor(None, self._read_metadata, source_metadata_path)
+            # O HTML reaproveitado aponta para os recursos da captura original
+            resources_meta = self._requeue_resources(source_metadata)
+            
+            # Hardlink (ou cópia) e metadados numa única ida à thread pool
+            metadata = self._metadata_bytes(snapshot, version_path, file_path, resources_meta)
+            await loop.run_in_executor(None, self._link_and_write, source_path, file_path, metadata_path, metadata)
+            snapshot.processed = True
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao reaproveitar captura idêntica de {snapshot.original_url}: {e}")
+            return False
+    
     @memory_safe()
     async def process_snapshot(self, snapshot: Snapshot) -> bool:
         if not snapshot.content:
@@ -644,70 +1313,51 @@ class HtmlProcessor:
             return False
         
         original_url = snapshot.original_url
-        content = snapshot.content
         timestamp = snapshot.timestamp
+        # O corpo bruto só serve ao parsing: sai do snapshot já aqui, para ser liberado
+        # assim que o executor o consumir, também quando o processamento falha
+        content, snapshot.content = snapshot.content, None
         
         try:
-            # Gerar nome de arquivo seguro
-            safe_filename = ResourceManager.generate_safe_filename(original_url)
-            version_path = f"{timestamp}_{safe_filename}"
+            version_path, file_path, metadata_path = self._get_snapshot_paths(snapshot)
             
-            # Definir caminho de arquivo
-            if safe_filename.endswith((".html", ".htm")):
-                file_path = self.html_dir / f"{version_path}"
-            else:
-                file_path = self.html_dir / f"{version_path}.html"
-            
-            # Processar o HTML para extração de recursos
-            soup = BeautifulSoup(content, "html.parser")
+            # Parsing e extração de recursos fora do event loop
+            loop = asyncio.get_running_loop()
+            html_bytes, extracted = await loop.run_in_executor(
+                self.executor,
+                parse_html_extract,
+                content,
+                original_url,
+                timestamp,
+                self.domain
+            )
+            del content
             
-            # Criar base URL para resolução de links relativos
-            base_url = original_url
-            if base_url.startswith(("http://", "https://")):
-                base_parts = urllib.parse.urlparse(base_url)
-                base_url = f"{base_parts.scheme}://{base_parts.netloc}"
-            else:
-                base_url = f"http://{self.domain}"
-            
-            # Ajustar URLs relativas no HTML
-            base_tag = soup.find("base")
-            if base_tag and "href" in base_tag.attrs:
-                base_href = base_tag["href"]
-                if not base_href.startswith(("http://", "https://")):
-                    base_tag["href"] = urllib.parse.urljoin(base_url, base_href)
-            
-            # Extrair e processar recursos
+            # Adicionar à fila de recursos para download posterior
             resources = []
-            resources.extend(await self._process_links(soup, timestamp, "link", "href", ["stylesheet"], base_url))
-            resources.extend(await self._process_links(soup, timestamp, "script", "src", None, base_url))
-            resources.extend(await self._process_links(soup, timestamp, "img", "src", None, base_url))
-            resources.extend(await self._process_links(soup, timestamp, "a", "href", None, base_url))
-            resources.extend(await self._process_links(soup, timestamp, "source", "srcset", None, base_url))
-            resources.extend(await self._process_links(soup, timestamp, "img", "srcset", None, base_url))
-            resources.extend(await self._process_links(soup, timestamp, "video", "src", None, base_url))
-            resources.extend(await self._process_links(soup, timestamp, "audio", "src", None, base_url))
-            
-            # Salvar conteúdo processado
-            async with aiofiles.open(file_path, "wb") as f:
-                await f.write(soup.encode("utf-8"))
+            for url, resource_type, tag_name, attr_name in extracted:
+                resource = ResourceInfo(
+                    url=url,
+                    type=resource_type,
+                    tag=tag_name,
+                    attr=attr_name,
+                    timestamp=timestamp
+                )
+                self.resource_manager.add_resource(resource)
+                resources.append(resource)
             
-            # Salvar metadados
-            metadata = {
-                "original_url": original_url,
-                "wayback_timestamp": timestamp,
-                "wayback_url": f"{WAYBACK_URL_PREFIX}{timestamp}/{original_url}",
-                "saved_path": str(file_path),
-                "extracted_date": datetime.now().isoformat(),
-                "version_path": version_path,
-                "resources": [{"url": r.url, "type": r.type, "tag": r.tag, "attr": r.attr} for r in resources]
-            }
+            # Salvar conteúdo processado e metadados numa única ida à thread pool
+            resources_meta = [{"url": r.url, "type": r.type, "tag": r.tag, "attr": r.attr} for r in resources]
+            metadata = self._metadata_bytes(snapshot, version_path, file_path, resources_meta)
+            digest_key = None
+            if snapshot.digest and self.cache is not None:
+                digest_key = f"{self._digest_cache_prefix}{original_url}_{snapshot.digest}"
+            await loop.run_in_executor(None, self._write_snapshot, file_path, html_bytes,
+                                       metadata_path, metadata, digest_key)
             
-            # Salvar metadados usando async IO
-            async with aiofiles.open(self.metadata_dir / f"{version_path}.json", "w", encoding="utf-8") as f:
-                await f.write(json.dumps(metadata, indent=2, ensure_ascii=False))
+            if snapshot.digest:
+                self.processed_digests[(original_url, snapshot.digest)] = (file_path, metadata_path)
             
-            # Liberar memória
-            snapshot.content = None
             snapshot.processed = True
             
             return True
@@ -716,62 +1366,24 @@ class HtmlProcessor:
             # Listar o traceback para depuração
             traceback.print_exc()
             return False
-    
-    async def _process_links(self, 
-                            soup: BeautifulSoup, 
-                            timestamp: str, 
-                            tag_name: str, 
-                            attr_name: str, 
-                            rel_values: Optional[List[str]] = None,
-                            base_url: str = "") -> List[ResourceInfo]:
-        resources = []
-        
-        for tag in soup.find_all(tag_name):
-            if attr_name not in tag.attrs:
-                continue
-                
-            url = tag[attr_name]
-            
-            # Para tags <link>, verificar o atributo rel se necessário
-            if tag_name == "link" and rel_values:
-                if "rel" not in tag.attrs or not any(rel in tag["rel"] for rel in rel_values):
-                    continue
-            
-            # Ignorar URLs em base64 ou data URI
-            if url.startswith(("data:", "javascript:", "#", "mailto:")):
-                continue
-            
-            # Normalizar URL
-            if not url.startswith(("http://", "https://")):
-                url = urllib.parse.urljoin(base_url, url)
-            
-            # Processar apenas URLs absolutas ou relativas para o mesmo domínio
-            parsed_url = urllib.parse.urlparse(url)
-            if not parsed_url.netloc or self.domain not in parsed_url.netloc:
-                continue
-            
-            # Adicionar à fila de recursos para download
-            if not self.resource_manager.is_url_processed(url):
-                resource_type = ResourceManager.determine_resource_type(url, tag_name)
-                
-                # Criar objeto ResourceInfo
-                resource = ResourceInfo(
-                    url=url,
-                    type=resource_type,
-                    tag=tag_name,
-                    attr=attr_name,
-                    timestamp=timestamp
-                )
-                
-                # Adicionar à lista para download posterior
-                self.resource_manager.add_resource(resource)
-                resources.append(resource)
-                
-                # Atualizar o atributo para apontar para o local salvo
-                local_path = self.resource_manager.get_local_resource_path(resource)
-                tag[attr_name] = local_path
-        
-        return resources
+
+# Uma única regex ancorada: as alternativas são tentadas em ordem (a primeira categoria que
+# casar define o tipo) e o nome do grupo vazio que casou identifica a categoria
+URL_TYPE_RE = re.compile(
+    r'^(?:'
+    r'(?=.*?(?:topic|thread|post|showthread|showpost))(?P<topics>)'
+    r'|(?=.*?(?:forum|board|forumdisplay))(?P<forums>)'
+    r'|(?=.*?(?:profile|member|user))(?P<profiles>)'
+    r'|(?=.*?(?:index\.php|/))(?P<index>)'
+    r'|(?=.*?(?:attachment|download|file))(?P<files>)'
+    r')',
+    re.DOTALL
+)
+
+@lru_cache(maxsize=None)
+def classify_url_type(url: str) -> str:
+    match = URL_TYPE_RE.match(url.lower())
+    return match.lastgroup if match else "other"
 
 class IndexBuilder:
     def __init__(self, output_dir: Path):
@@ -779,106 +1391,123 @@ class IndexBuilder:
         self.metadata_dir = output_dir / "metadata"
         self.index_template_path = Path(__file__).parent / "index_template.html"
     
+    @staticmethod
+    def _read_metadata_file(metadata_file: str) -> Dict[str, Any]:
+        # open/read/close numa única ida à thread pool (aiofiles faz uma por operação)
+        with open(metadata_file, "rb") as f:
+            return orjson.loads(f.read())
+    
+    @staticmethod
+    def _format_timestamp(timestamp: str) -> str:
+        # Timestamps do Wayback têm formato fixo (YYYYMMDDhhmmss): fatiar é bem mais barato que strptime
+        if not timestamp or len(timestamp) < 8 or not timestamp.isdigit():
+            return "N/A"
+        
+        formatted_date = f"{timestamp[6:8]}/{timestamp[4:6]}/{timestamp[:4]}"
+        if len(timestamp) > 8:
+            formatted_date += f" {timestamp[8:10]}:{timestamp[10:12]}:{timestamp[12:14] if len(timestamp) >= 14 else '00'}"
+        return formatted_date
+    
+    def _list_metadata_files(self) -> List[str]:
+        # os.scandir devolve o nome já pronto em cada entrada, sem criar um Path por arquivo
+        if not self.metadata_dir.is_dir():
+            return []
+        with os.scandir(self.metadata_dir) as entries:
+            return [entry.path for entry in entries if entry.name.endswith(".json")]
+    
+    def _read_version_entry(self, metadata_file: str, output_prefix: str) -> Tuple[str, Dict[str, Any]]:
+        # Leitura, parsing e extração dos campos na mesma ida à thread pool: o parsing de um
+        # arquivo se sobrepõe à leitura dos outros e o metadata completo (com a lista de
+        # recursos) é descartado logo, sem ficar retido até o fim da coleta
+        metadata = self._read_metadata_file(metadata_file)
+        
+        # saved_path é gravado com o prefixo do diretório de saída; o índice usa caminhos relativos
+        html_path = metadata.get("saved_path", "")
+        if html_path.startswith(output_prefix):
+            html_path = html_path[len(output_prefix):]
+        
+        # Sempre str: permite ordenar direto pela chave, sem condicional
+        timestamp = metadata.get("wayback_timestamp") or ""
+        
+        return metadata.get("original_url", ""), {
+            "html_path": html_path,
+            "timestamp": timestamp,
+            "formatted_date": self._format_timestamp(timestamp),
+            "wayback_url": metadata.get("wayback_url", ""),
+            "version_path": metadata.get("version_path", "")
+        }
+    
     async def _organize_versions_by_url(self) -> Dict[str, List[Dict[str, Any]]]:
-        versions = {}
-        metadata_files = list(self.metadata_dir.glob("*.json"))
+        versions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        output_prefix = str(self.output_dir) + os.sep
+        metadata_files = self._list_metadata_files()
         
-        for metadata_file in metadata_files:
-            try:
-                async with aiofiles.open(metadata_file, "r", encoding="utf-8") as f:
-                    content = await f.read()
-                    metadata = json.loads(content)
-                
-                original_url = metadata.get("original_url", "")
-                if original_url not in versions:
-                    versions[original_url] = []
-                
-                html_path = metadata.get("saved_path", "")
-                html_path = html_path.replace(str(self.output_dir) + os.sep, "")
-                
-                timestamp = metadata.get("wayback_timestamp", "")
-                if timestamp and len(timestamp) >= 8:
-                    date_obj = datetime.strptime(timestamp[:8], "%Y%m%d")
-                    formatted_date = date_obj.strftime("%d/%m/%Y")
-                    if len(timestamp) > 8:
-                        time_str = f"{timestamp[8:10]}:{timestamp[10:12]}:{timestamp[12:14] if len(timestamp) >= 14 else '00'}"
-                        formatted_date += f" {time_str}"
-                else:
-                    formatted_date = "N/A"
-                
-                versions[original_url].append({
-                    "html_path": html_path,
-                    "timestamp": timestamp,
-                    "formatted_date": formatted_date,
-                    "wayback_url": metadata.get("wayback_url", ""),
-                    "version_path": metadata.get("version_path", "")
-                })
-            except Exception as e:
-                logger.error(f"Erro ao processar metadata {metadata_file}: {e}")
+        # Leituras concorrentes (limitadas) dos muitos arquivos pequenos de metadados
+        semaphore = asyncio.Semaphore(METADATA_READ_CONCURRENCY)
+        
+        loop = asyncio.get_running_loop()
+        
+        async def read_entry(metadata_file: str) -> Tuple[str, Dict[str, Any]]:
+            async with semaphore:
+                return await loop.run_in_executor(None, self._read_version_entry, metadata_file, output_prefix)
+        
+        results = await asyncio.gather(*[read_entry(path) for path in metadata_files],
+                                       return_exceptions=True)
+        
+        for metadata_file, result in zip(metadata_files, results):
+            if isinstance(result, Exception):
+                logger.error(f"Erro ao processar metadata {metadata_file}: {result}")
+                continue
+            original_url, entry = result
+            versions[original_url].append(entry)
         
         # Ordenar por timestamp mais recente
-        for url in versions:
-            versions[url].sort(key=lambda x: x["timestamp"] if x["timestamp"] else "", reverse=True)
+        by_timestamp = itemgetter("timestamp")
+        for url_versions in versions.values():
+            url_versions.sort(key=by_timestamp, reverse=True)
         
-        return versions
+        return dict(versions)
     
     def _collect_stats(self, versions_by_url: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
         total_versions = sum(len(versions) for versions in versions_by_url.values())
         
-        url_types = {}
-        years = {}
-        months = {}
-        
-        for url, versions in versions_by_url.items():
-            url_type = self._determine_url_type(url)
-            if url_type not in url_types:
-                url_types[url_type] = 0
-            url_types[url_type] += 1
-            
-            for version in versions:
-                timestamp = version.get("timestamp", "")
-                if timestamp and len(timestamp) >= 8:
-                    year = timestamp[:4]
-                    if year not in years:
-                        years[year] = 0
-                    years[year] += 1
-                    
-                    if len(timestamp) >= 6:
-                        month_key = f"{year}-{timestamp[4:6]}"
-                        if month_key not in months:
-                            months[month_key] = 0
-                        months[month_key] += 1
-        
-        sorted_years = dict(sorted(years.items()))
-        sorted_months = dict(sorted(months.items()))
+        # Tipo de cada URL calculado uma vez e reaproveitado nas linhas do índice
+        url_types_by_url = {url: self._determine_url_type(url) for url in versions_by_url}
+        url_types = dict(Counter(url_types_by_url.values()))
+        
+        # Contagem única por AAAAMM (fatiamento e contagem feitos em C pelo Counter);
+        # os totais por ano saem da soma dos meses
+        timestamps = (
+            version.get("timestamp") or ""
+            for versions in versions_by_url.values()
+            for version in versions
+        )
+        month_counts = Counter(timestamp[:6] for timestamp in timestamps if len(timestamp) >= 8)
+        
+        years: Dict[str, int] = {}
+        months: Dict[str, int] = {}
+        for year_month, count in sorted(month_counts.items()):
+            year = year_month[:4]
+            years[year] = years.get(year, 0) + count
+            months[f"{year}-{year_month[4:]}"] = count
         
         return {
             "total_urls": len(versions_by_url),
             "total_versions": total_versions,
             "url_types": url_types,
-            "years": sorted_years,
-            "months": sorted_months
+            "url_types_by_url": url_types_by_url,
+            "years": years,
+            "months": months
         }
     
     def _determine_url_type(self, url: str) -> str:
-        url_lower = url.lower()
-        
-        if re.search(r'(topic|thread|post|showthread|showpost)', url_lower):
-            return "topics"
-        elif re.search(r'(forum|board|forumdisplay)', url_lower):
-            return "forums"
-        elif re.search(r'(profile|member|user)', url_lower):
-            return "profiles"
-        elif re.search(r'(index\.php|\/|^https?:\/\/[^\/]+\/?$)', url_lower):
-            return "index"
-        elif re.search(r'(attachment|download|file)', url_lower):
-            return "files"
-        else:
-            return "other"
+        return classify_url_type(url)
     
-    def _format_url_display(self, url: str) -> str:
-        # Remover protocolo
-        display = re.sub(r'^https?:\/\/', '', url)
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _format_url_display(url: str) -> str:
+        # Remover protocolo (regex ancorada: no máximo uma substituição)
+        display = URL_SCHEME_RE.sub('', url, count=1)
         
         # Truncar se for muito longo
         if len(display) > 70:
@@ -908,7 +1537,9 @@ class IndexBuilder:
     <title>Kali Archive - Arquivo Digital</title>
     <meta name="description" content="Arquivo histórico de páginas recuperadas via Wayback Machine">
     <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css">
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css">
+    <!-- Ícones não bloqueiam a renderização: só o Tailwind é necessário para o layout -->
+    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css" media="print" onload="this.media='all'">
+    <noscript><link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css"></noscript>
     <style>
         .version-list {
             max-height: 0;
@@ -918,6 +1549,10 @@ class IndexBuilder:
         .version-list.show {
             max-height: 500px;
         }
+        /* Listas recolhidas (a maioria) ficam fora do layout e da pintura */
+        .version-list:not(.show) {
+            content-visibility: hidden;
+        }
         /* Dark mode */
         .dark {
             background-color: #1a202c;
@@ -1050,10 +1685,36 @@ class IndexBuilder:
                 darkModeToggle.innerHTML = '<i class="fas fa-sun"></i>';
             }
             
+            // Itens da lista de versões criados a partir de data-versions na primeira abertura
+            const versionItem = document.createElement('template');
+            versionItem.innerHTML = `<div class="py-1 flex flex-wrap">
+                <span class="text-gray-500 dark:text-gray-400 mr-2 w-36"></span>
+                <a class="text-blue-500 dark:text-blue-400 hover:underline mr-2">Ver</a>
+                <a class="text-green-500 dark:text-green-400 hover:underline" target="_blank">
+                    <i class="fas fa-archive text-xs"></i> Wayback
+                </a>
+            </div>`;
+            
+            function renderVersions(list) {
+                if (!list.dataset.versions) return;
+                const fragment = document.createDocumentFragment();
+                JSON.parse(list.dataset.versions).forEach(([date, htmlPath, waybackUrl]) => {
+                    const item = versionItem.content.firstElementChild.cloneNode(true);
+                    const links = item.querySelectorAll('a');
+                    item.querySelector('span').textContent = date;
+                    links[0].setAttribute('href', htmlPath);
+                    links[1].setAttribute('href', waybackUrl);
+                    fragment.appendChild(item);
+                });
+                list.appendChild(fragment);
+                delete list.dataset.versions;
+            }
+            
             toggleButtons.forEach(button => {
                 button.addEventListener('click', function(e) {
                     e.preventDefault();
                     const versionList = this.nextElementSibling;
+                    renderVersions(versionList);
                     versionList.classList.toggle('show');
                     e.stopPropagation();
                 });
@@ -1063,6 +1724,7 @@ class IndexBuilder:
                 allVersionsVisible = !allVersionsVisible;
                 document.querySelectorAll('.version-list').forEach(list => {
                     if (allVersionsVisible) {
+                        renderVersions(list);
                         list.classList.add('show');
                         this.innerHTML = '<i class="fas fa-history mr-1"></i> Ocultar versões';
                     } else {
@@ -1086,7 +1748,26 @@ class IndexBuilder:
                 }
             });
             
-            search.addEventListener('keyup', filterTable);
+            // Texto de busca (já em minúsculas), tipo e ano de cada linha lidos uma única vez
+            const rowData = Array.from(document.querySelectorAll('#pagesTable tbody tr'), row => ({
+                row: row,
+                search: row.dataset.search,
+                type: row.dataset.type,
+                year: row.dataset.year
+            }));
+            
+            // Digitação em rajada vira uma única filtragem por quadro; 'input' cobre também colar e IME
+            let filterScheduled = false;
+            function scheduleFilter() {
+                if (filterScheduled) return;
+                filterScheduled = true;
+                requestAnimationFrame(() => {
+                    filterScheduled = false;
+                    filterTable();
+                });
+            }
+            
+            search.addEventListener('input', scheduleFilter);
             filterType.addEventListener('change', filterTable);
             filterYear.addEventListener('change', filterTable);
             
@@ -1094,28 +1775,23 @@ class IndexBuilder:
                 const searchValue = search.value.toLowerCase();
                 const typeFilter = filterType.value;
                 const yearFilter = filterYear.value;
-                const rows = document.querySelectorAll('#pagesTable tbody tr');
                 let visibleCount = 0;
                 
-                rows.forEach(row => {
-                    const url = row.querySelector('td:first-child').textContent.toLowerCase();
-                    const type = row.dataset.type;
-                    const year = row.dataset.year;
-                    
-                    const matchesSearch = url.includes(searchValue);
-                    const matchesType = typeFilter === 'all' || type === typeFilter;
-                    const matchesYear = yearFilter === 'all' || year === yearFilter;
+                rowData.forEach(item => {
+                    const matchesSearch = item.search.includes(searchValue);
+                    const matchesType = typeFilter === 'all' || item.type === typeFilter;
+                    const matchesYear = yearFilter === 'all' || item.year === yearFilter;
                     
                     if (matchesSearch && matchesType && matchesYear) {
-                        row.style.display = '';
+                        item.row.style.display = '';
                         visibleCount++;
                     } else {
-                        row.style.display = 'none';
+                        item.row.style.display = 'none';
                     }
                 });
                 
                 document.getElementById('statsInfo').innerHTML = 
-                    `Exibindo: <span class="font-semibold">${visibleCount}</span> de <span class="font-semibold">${rows.length}</span> URLs`;
+                    `Exibindo: <span class="font-semibold">${visibleCount}</span> de <span class="font-semibold">${rowData.length}</span> URLs`;
             }
             
             // Inicializar contadores
@@ -1123,44 +1799,25 @@ class IndexBuilder:
         });
         
         function sortTable(n) {
-            let table, rows, switching, i, x, y, shouldSwitch, dir, switchcount = 0;
-            table = document.getElementById("pagesTable");
-            switching = true;
-            dir = "asc";
+            const table = document.getElementById("pagesTable");
+            const tbody = table.tBodies[0];
             
-            while (switching) {
-                switching = false;
-                rows = table.rows;
-                
-                for (i = 1; i < (rows.length - 1); i++) {
-                    shouldSwitch = false;
-                    x = rows[i].getElementsByTagName("TD")[n];
-                    y = rows[i + 1].getElementsByTagName("TD")[n];
-                    
-                    if (dir == "asc") {
-                        if (x.innerHTML.toLowerCase() > y.innerHTML.toLowerCase()) {
-                            shouldSwitch = true;
-                            break;
-                        }
-                    } else if (dir == "desc") {
-                        if (x.innerHTML.toLowerCase() < y.innerHTML.toLowerCase()) {
-                            shouldSwitch = true;
-                            break;
-                        }
-                    }
-                }
-                
-                if (shouldSwitch) {
-                    rows[i].parentNode.insertBefore(rows[i + 1], rows[i]);
-                    switching = true;
-                    switchcount++;
-                } else {
-                    if (switchcount == 0 && dir == "asc") {
-                        dir = "desc";
-                        switching = true;
-                    }
-                }
-            }
+            // Chave de cada linha calculada uma vez; um único sort e uma única reinserção no DOM
+            const items = Array.from(tbody.rows, (row, index) => ({
+                row: row,
+                index: index,
+                key: row.cells[n].innerHTML.toLowerCase()
+            }));
+            
+            // Como antes: crescente, a menos que a coluna já esteja em ordem crescente
+            const alreadyAsc = items.every((item, i) => i === 0 || items[i - 1].key <= item.key);
+            const dir = alreadyAsc ? "desc" : "asc";
+            const sign = dir === "asc" ? 1 : -1;
+            items.sort((a, b) => (a.key < b.key ? -sign : a.key > b.key ? sign : a.index - b.index));
+            
+            const fragment = document.createDocumentFragment();
+            items.forEach(item => fragment.appendChild(item.row));
+            tbody.appendChild(fragment);
             
             const headers = table.querySelectorAll("th");
             headers.forEach((header, index) => {
@@ -1176,7 +1833,7 @@ class IndexBuilder:
 </body>
 </html>"""
 
-    def _generate_index_html(self, versions_by_url: Dict[str, List[Dict[str, Any]]], stats: Dict[str, Any]) -> str:
+    def _iter_index_html(self, versions_by_url: Dict[str, List[Dict[str, Any]]], stats: Dict[str, Any]) -> Iterator[str]:
         template = self._load_template()
         
         # Substituir estatísticas
@@ -1184,32 +1841,62 @@ class IndexBuilder:
         template = template.replace("{{STATS_INFO}}", stats_info)
         
         # Gerar opções de tipo
-        type_options = ""
-        for url_type, count in stats["url_types"].items():
-            type_options += f'<option value="{url_type}">{url_type.capitalize()} ({count})</option>\n'
+        type_options = "".join(
+            f'<option value="{url_type}">{url_type.capitalize()} ({count})</option>\n'
+            for url_type, count in stats["url_types"].items()
+        )
         template = template.replace("{{TYPE_OPTIONS}}", type_options)
         
         # Gerar opções de ano
-        year_options = ""
-        for year, count in stats["years"].items():
-            year_options += f'<option value="{year}">{year} ({count})</option>\n'
+        year_options = "".join(
+            f'<option value="{year}">{year} ({count})</option>\n'
+            for year, count in stats["years"].items()
+        )
         template = template.replace("{{YEAR_OPTIONS}}", year_options)
         
+        # Cabeçalho até {{TABLE_ROWS}}, depois as linhas e por fim o rodapé:
+        # o HTML completo nunca é montado em memória
+        head, has_rows, tail = template.partition("{{TABLE_ROWS}}")
+        yield head
+        if not has_rows:
+            return
+        
         # Gerar linhas da tabela
-        table_rows = ""
-        for url, versions in versions_by_url.items():
-            if not versions:
-                continue
-                
+        url_types_by_url = stats["url_types_by_url"]
+        # Linhas já saem ordenadas pela captura mais recente (versions[0] após a ordenação
+        # em _organize_versions_by_url), sem depender de ordenar no navegador
+        rows = sorted(
+            ((url, versions) for url, versions in versions_by_url.items() if versions),
+            key=lambda item: item[1][0]["timestamp"],
+            reverse=True
+        )
+        # Funções usadas a cada linha resolvidas uma vez, fora do laço; html.escape (quote=True
+        # por padrão) é chamado direto: as substituições são feitas em C, sem frame em Python
+        escape = html.escape
+        format_url_display = self._format_url_display
+        dumps = orjson.dumps
+        version_fields = itemgetter("formatted_date", "html_path", "wayback_url")
+        
+        for url, versions in rows:
             latest = versions[0]
-            url_type = self._determine_url_type(url)
-            url_display = self._format_url_display(url)
+            url_type = url_types_by_url[url]
+            # URLs vêm do Wayback sem tratamento: escapar antes de interpolar no HTML
+            display = format_url_display(url)
+            url_display = escape(display)
+            # Chave de busca já em minúsculas: o filtro no navegador não normaliza a cada tecla
+            search_key = escape(display.lower())
+            latest_html_path = escape(latest['html_path'])
+            latest_wayback_url = escape(latest['wayback_url'])
             
             year = latest["timestamp"][:4] if latest["timestamp"] and len(latest["timestamp"]) >= 4 else ""
             
-            table_rows += f"""
+            # Versões vão como JSON num atributo e a lista só é montada no navegador ao ser
+            # aberta: o índice não carrega milhares de links ocultos no HTML e no DOM
+            versions_data = escape(dumps(list(map(version_fields, versions))).decode())
+            
+            yield f"""
                     <tr class="border-b border-gray-200 dark:border-gray-700 hover:bg-gray-100 dark:hover:bg-gray-700 transition duration-150" 
-                        data-type="{url_type}" data-year="{year}" data-url="{url_display}">
+                        data-type="{url_type}" data-year="{year}" data-url="{url_display}" data-search="{search_key}">
                         <td class="py-3 px-6 text-left">
                             <div class="font-medium">{url_display}</div>
                         </td>
@@ -1218,29 +1905,15 @@ class IndexBuilder:
                             <button class="toggle-versions bg-gray-200 hover:bg-gray-300 dark:bg-gray-600 dark:hover:bg-gray-500 dark:text-gray-200 text-gray-700 text-xs py-1 px-2 rounded transition duration-200">
                                 <i class="fas fa-clock mr-1"></i> {len(versions)} versões
                             </button>
-                            <div class="version-list mt-2 pl-2 border-l-2 border-gray-300 dark:border-gray-600 overflow-hidden max-h-0">
-            """
-            
-            for version in versions:
-                table_rows += f"""
-                                <div class="py-1 flex flex-wrap">
-                                    <span class="text-gray-500 dark:text-gray-400 mr-2 w-36">{version['formatted_date']}</span>
-                                    <a href="{version['html_path']}" class="text-blue-500 dark:text-blue-400 hover:underline mr-2">Ver</a>
-                                    <a href="{version['wayback_url']}" class="text-green-500 dark:text-green-400 hover:underline" target="_blank">
-                                        <i class="fas fa-archive text-xs"></i> Wayback
-                                    </a>
-                                </div>
-                """
-            
-            table_rows += f"""
-                            </div>
+                            <div class="version-list mt-2 pl-2 border-l-2 border-gray-300 dark:border-gray-600 overflow-hidden max-h-0"
+                                 data-versions="{versions_data}"></div>
                         </td>
                         <td class="py-3 px-6 text-center">
                             <div class="flex justify-center items-center space-x-2">
-                                <a href="{latest['html_path']}" class="bg-blue-500 hover:bg-blue-600 dark:bg-blue-600 dark:hover:bg-blue-700 text-white py-1 px-3 rounded-lg text-xs transition duration-200 hover-effect">
+                                <a href="{latest_html_path}" class="bg-blue-500 hover:bg-blue-600 dark:bg-blue-600 dark:hover:bg-blue-700 text-white py-1 px-3 rounded-lg text-xs transition duration-200 hover-effect">
                                     <i class="fas fa-eye mr-1"></i> Ver
                                 </a>
-                                <a href="{latest['wayback_url']}" target="_blank" class="bg-green-500 hover:bg-green-600 dark:bg-green-600 dark:hover:bg-green-700 text-white py-1 px-3 rounded-lg text-xs transition duration-200 hover-effect">
+                                <a href="{latest_wayback_url}" target="_blank" class="bg-green-500 hover:bg-green-600 dark:bg-green-600 dark:hover:bg-green-700 text-white py-1 px-3 rounded-lg text-xs transition duration-200 hover-effect">
                                     <i class="fas fa-archive mr-1"></i> Wayback
                                 </a>
                             </div>
@@ -1248,9 +1921,12 @@ class IndexBuilder:
                     </tr>
             """
         
-        template = template.replace("{{TABLE_ROWS}}", table_rows)
-        
-        return template
+        yield tail
+    
+    @staticmethod
+    def _write_index_file(index_path: Path, chunks: Iterable[str]) -> None:
+        with open(index_path, "w", encoding="utf-8", buffering=INDEX_WRITE_BUFFER) as f:
+            f.writelines(chunks)
     
     async def create_index(self) -> None:
         logger.info("Criando arquivo de índice...")
@@ -1261,12 +1937,11 @@ class IndexBuilder:
             # Obter estatísticas para os filtros
             stats = self._collect_stats(versions_by_url)
             
-            # Gerar HTML para o índice
-            index_html = self._generate_index_html(versions_by_url, stats)
-            
-            # Salvar o arquivo de índice
-            async with aiofiles.open(self.output_dir / "index.html", "w", encoding="utf-8") as f:
-                await f.write(index_html)
+            # Gerar e salvar o índice em blocos, fora do event loop
+            index_path = self.output_dir / "index.html"
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write_index_file, index_path, self._iter_index_html(versions_by_url, stats)
+            )
             
             logger.info(f"Índice criado com {len(versions_by_url)} URLs diferentes.")
             
@@ -1286,7 +1961,9 @@ class KaliArchive:
                  cache_enabled: bool = True,
                  memory_safe: bool = True,
                  auto_detect_date: bool = True, #<-- Detecção automática da data inicial do domínio (Utilize False para desativar).
-                 timeout: int = REQUEST_TIMEOUT):
+                 timeout: int = REQUEST_TIMEOUT,
+                 cdx_ttl_hours: int = CDX_CACHE_TTL_HOURS,
+                 zip_output: bool = False):
         
         self.domain = domain
         self.output_dir = Path(output_dir)
@@ -1298,67 +1975,55 @@ class KaliArchive:
         self.memory_safe = memory_safe
         self.timeout = timeout
         self.auto_detect_date = auto_detect_date
+        self.cdx_ttl_hours = cdx_ttl_hours
+        # Pacote ao lado do diretório de saída, com o nome real dele ("-o ." ou "-o .." não têm
+        # nome próprio); a raiz do sistema de arquivos não tem nome e não pode ser empacotada
+        self.zip_path: Optional[Path] = None
+        if zip_output:
+            resolved_output = self.output_dir.resolve()
+            if resolved_output.name:
+                self.zip_path = resolved_output.with_name(f"{resolved_output.name}.zip")
+        self.zip_output = zip_output
         
-        self.session = create_session()
         self.stats = MemoryStats()
         
         if cache_enabled:
-            self.cache = diskcache.Cache(CACHE_DIR, size_limit=10_000_000_000)
+            self.cache = diskcache.Cache(CACHE_DIR, size_limit=10_000_000_000,
+                                         disk_pickle_protocol=pickle.HIGHEST_PROTOCOL)
         else:
             self.cache = None
         
         # Inicializar componentes
-        self.date_detector = DomainDateDetector(domain, self.session)
-        self.resource_manager = ResourceManager(self.output_dir, domain, self.cache, threads)
-        self.html_processor = HtmlProcessor(self.output_dir, domain, self.resource_manager)
+        self.date_detector = DomainDateDetector(domain)
+        # Um único limitador para snapshots e recursos: o limite vale para o total de requisições
+        self.rate_limiter = RateLimiter(DOWNLOAD_RATE_LIMIT)
+        self.resource_manager = ResourceManager(self.output_dir, domain, self.cache, threads,
+                                                rate_limiter=self.rate_limiter)
+        self.html_processor = HtmlProcessor(self.output_dir, domain, self.resource_manager, cache=self.cache)
         self.index_builder = IndexBuilder(self.output_dir)
         
-        # Configurar manipuladores de sinal
+        # Configurar manipuladores de sinal e coletor de lixo
         setup_signal_handlers(self._cleanup)
+        configure_gc()
     
     def _parse_date(self, date_str: Optional[str]) -> Optional[str]:
         if not date_str:
             return None
             
-        patterns = [
-            (r'^\d{8}$', lambda m: m.group(0)),  # YYYYMMDD
-            (r'^\d{4}-\d{2}-\d{2}$', lambda m: m.group(0).replace('-', '')),  # YYYY-MM-DD
-            (r'^\d{2}/\d{2}/\d{4}$', lambda m: f"{m.group(3)}{m.group(2)}{m.group(1)}"),  # DD/MM/YYYY
-            (r'^\d{2}-\d{2}-\d{4}$', lambda m: f"{m.group(3)}{m.group(2)}{m.group(1)}"),  # DD-MM-YYYY
-            (r'^\d{4}/\d{2}/\d{2}$', lambda m: f"{m.group(1)}{m.group(2)}{m.group(3)}"),  # YYYY/MM/DD
-        ]
-        
-        for pattern, formatter in patterns:
-            match = re.match(pattern, date_str)
+        for pattern, formatter in DATE_PATTERNS:
+            match = pattern.match(date_str)
             if match:
                 return formatter(match)
         
-        relative_dates = {
-            "hoje": datetime.now(),
-            "today": datetime.now(),
-            "ontem": datetime.now() - timedelta(days=1),
-            "yesterday": datetime.now() - timedelta(days=1),
-            "semana_passada": datetime.now() - timedelta(weeks=1),
-            "last_week": datetime.now() - timedelta(weeks=1),
-            "mes_passado": datetime.now() - timedelta(days=30),
-            "last_month": datetime.now() - timedelta(days=30),
-            "ano_passado": datetime.now() - timedelta(days=365),
-            "last_year": datetime.now() - timedelta(days=365)
-        }
+        offset = RELATIVE_DATE_OFFSETS.get(date_str.lower())
+        if offset is not None:
+            return (datetime.now() - offset).strftime("%Y%m%d")
         
-        date_str_lower = date_str.lower()
-        if date_str_lower in relative_dates:
-            return relative_dates[date_str_lower].strftime("%Y%m%d")
-            
-        try:
-            for fmt in ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%Y/%m/%d", "%d.%m.%Y", "%Y.%m.%d"]:
-                try:
-                    dt = datetime.strptime(date_str, fmt)
-                    return dt.strftime("%Y%m%d")
-                except ValueError:
-                    continue
-        except Exception:
-            pass
+        for fmt in DATE_FALLBACK_FORMATS:
+            try:
+                return datetime.strptime(date_str, fmt).strftime("%Y%m%d")
+            except ValueError:
+                continue
             
         logger.warning(f"Data inválida: {date_str}. Usando formato padrão YYYYMMDD.")
         return FIXED_FALLBACK_DATE
@@ -1370,10 +2035,6 @@ class KaliArchive:
                 self.cache.close()
             except Exception as e:
                 logger.error(f"Erro ao fechar cache: {e}")
-        
-        # Força coleta de lixo
-        import gc
-        gc.collect()
     
     async def _initialize_dates(self) -> None:
         parsed_start_date = self._parse_date(self.user_start_date) if self.user_start_date else None
@@ -1400,87 +2061,186 @@ class KaliArchive:
             self.end_date = datetime.now().strftime("%Y%m%d")
             logger.info(f"Data final: {self.end_date} (atual)")
     
+    def _bind_session(self, session: Optional[aiohttp.ClientSession]) -> None:
+        self.date_detector.session = session
+        self.resource_manager.session = session
+    
     async def run(self) -> None:
         logger.info(f"Iniciando extração de {self.domain}")
         self.stats.update()
         
+        if self.zip_output and self.zip_path is None:
+            logger.error(f"Não é possível empacotar o diretório de saída {self.output_dir.resolve()} (--zip). Operação abortada.")
+            return
+        
         # Verificar espaço em disco
         if not is_disk_space_ok(str(self.output_dir), required_gb=10.0):
             logger.error("Espaço em disco insuficiente (recomendado: 10GB). Operação abortada.")
             return
         
+        # Parsing de HTML em processos separados para usar todos os núcleos
+        mp_context = multiprocessing.get_context(PARSE_POOL_START_METHOD)
+        if PARSE_POOL_START_METHOD == "forkserver":
+            # BeautifulSoup e lxml importados uma vez no servidor, não em cada processo
+            mp_context.set_forkserver_preload(["bs4"])
+        parse_pool = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                                            mp_context=mp_context,
+                                                            initializer=configure_gc)
+        self.html_processor.executor = parse_pool
+        
         try:
-            # Inicializar datas
-            await self._initialize_dates()
-            
-            # 1. Buscar snapshots
-            with timing("Busca de snapshots"):
-                snapshot_fetcher = SnapshotFetcher(
-                    domain=self.domain,
-                    start_date=self.start_date,
-                    end_date=self.end_date,
-                    max_snapshots=self.max_pages,
-                    all_versions=self.all_versions,
-                    memory_safe=self.memory_safe
-                )
-                
-                snapshots = await snapshot_fetcher.fetch_all_snapshots()
-                
-                if not snapshots:
-                    logger.error("Não foi possível encontrar snapshots. Abortando.")
-                    return
-            
-            # 2. Baixar e processar snapshots HTML de forma assíncrona
-            logger.info(f"Baixando {len(snapshots)} snapshots...")
-            
-            # Limitar o número de snapshots se especificado
-            if self.max_pages and len(snapshots) > self.max_pages:
-                snapshots = snapshots[:self.max_pages]
+            # Uma única sessão para toda a execução: reaproveita conexões keep-alive e cache DNS
+            # Conexões suficientes para os downloads e as consultas ao CDX, que agora correm juntos
+            async with create_async_session(timeout=self.timeout,
+                                            limit_per_host=self.threads + CDX_CONCURRENCY) as session:
+                self._bind_session(session)
+                await self._run_pipeline(session)
+        except Exception as e:
+            logger.error(f"Erro durante a execução: {str(e)}")
+            traceback.print_exc()
+        finally:
+            self._bind_session(None)
+            self.html_processor.executor = None
+            # A espera pelo fim dos processos de parsing sai do event loop e se sobrepõe ao
+            # fechamento do cache (que fica nesta thread: o diskcache fecha a conexão da thread atual)
+            pool_shutdown = asyncio.get_running_loop().run_in_executor(None, parse_pool.shutdown)
+            self._cleanup()
+            await pool_shutdown
+    
+    async def _run_pipeline(self, session: aiohttp.ClientSession) -> None:
+        # Inicializar datas
+        await self._initialize_dates()
+        
+        # 1. Buscar snapshots (em fluxo: o processamento começa com os primeiros períodos)
+        snapshot_fetcher = SnapshotFetcher(
+            domain=self.domain,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            max_snapshots=self.max_pages,
+            all_versions=self.all_versions,
+            memory_safe=self.memory_safe,
+            session=session,
+            seed_snapshots=[self.date_detector.earliest_snapshot] if self.date_detector.earliest_snapshot else None,
+            cache=self.cache,
+            cdx_ttl_hours=self.cdx_ttl_hours,
+            rate_limiter=self.rate_limiter
+        )
+        
+        # 2. Baixar e processar snapshots HTML de forma assíncrona
+        logger.info("Baixando snapshots à medida que são encontrados...")
+        
+        # Usar semáforo para limitar o número de downloads simultâneos
+        semaphore = asyncio.Semaphore(self.threads)
+        # O parsing acontece fora do semáforo de download, para que a próxima requisição
+        # comece enquanto o HTML anterior é processado; o número de workers limita o conteúdo em memória
+        pipeline_workers = self.threads * 2
+        
+        submitted_snapshots = 0
+        
+        # Métodos e objetos usados a cada snapshot resolvidos uma única vez
+        stats = self.stats
+        cache = self.cache
+        resume_snapshot = self.html_processor.resume_snapshot
+        process_duplicate = self.html_processor.process_duplicate
+        claim_digest = self.html_processor.claim_digest
+        release_digest = self.html_processor.release_digest
+        download_snapshot = snapshot_fetcher.download_snapshot
+        process_html = self.html_processor.process_snapshot
+        
+        async def process_snapshot(snapshot):
+            if await resume_snapshot(snapshot):
+                stats.snapshots_processed += 1
+                return True
             
-            # Usar semáforo para limitar o número de downloads simultâneos
-            semaphore = asyncio.Semaphore(self.threads)
+            # Repete enquanto outra captura idêntica estiver em andamento: se ela falhar,
+            # um dos que esperavam assume o download
+            while True:
+                if await process_duplicate(snapshot):
+                    stats.snapshots_processed += 1
+                    return True
+                if claim_digest(snapshot):
+                    break
             
-            async def process_snapshot(snapshot):
+            try:
                 async with semaphore:
-                    success = await snapshot_fetcher.download_snapshot(snapshot, self.cache)
-                    if success:
-                        await self.html_processor.process_snapshot(snapshot)
-                        self.stats.snapshots_processed += 1
-                        if self.stats.snapshots_processed % 20 == 0:
-                            self.stats.update()
-                            logger.info(f"Progresso: {self.stats.snapshots_processed}/{len(snapshots)} snapshots | {self.stats}")
-                        return True
+                    success = await download_snapshot(snapshot, cache)
+                if not success:
                     return False
-            
-            with timing("Download e processamento de snapshots"):
-                results = await async_tqdm.gather(
-                    *[process_snapshot(snapshot) for snapshot in snapshots],
-                    desc="Baixando snapshots",
-                    total=len(snapshots)
-                )
-            
-            successful_snapshots = sum(1 for r in results if r)
-            logger.info(f"Downloads concluídos. {successful_snapshots} de {len(snapshots)} snapshots foram baixados e processados com sucesso.")
-            
-            # 3. Baixar recursos
-            with timing("Download de recursos"):
-                await self.resource_manager.download_all_resources(self.stats)
-            
-            # Atualizar estatísticas finais
-            self.stats.update()
-            logger.info(f"Estatísticas finais: {self.stats}")
-            
-            # 4. Criar índice
-            with timing("Criação de índice"):
-                await self.index_builder.create_index()
                 
-            logger.info(f"Extração concluída! Arquivos salvos em: {self.output_dir.absolute()}")
+                if not await process_html(snapshot):
+                    return False
+            finally:
+                release_digest(snapshot)
+            stats.snapshots_processed += 1
+            if stats.snapshots_processed % 20 == 0:
+                stats.update()
+                logger.info(f"Progresso: {stats.snapshots_processed}/{submitted_snapshots} snapshots | {stats}")
+            return True
         
-        except Exception as e:
-            logger.error(f"Erro durante a execução: {str(e)}")
-            traceback.print_exc()
-        finally:
-            self._cleanup()
+        # Pool fixo de workers consumindo uma fila limitada, como em download_all_resources:
+        # estado O(workers) em vez de uma corrotina por snapshot criada de uma só vez
+        queue: asyncio.Queue = asyncio.Queue(maxsize=pipeline_workers * 2)
+        
+        async def worker(progress):
+            while True:
+                snapshot = await queue.get()
+                try:
+                    if snapshot is None:
+                        return
+                    # Sucessos são contados em self.stats.snapshots_processed
+                    await process_snapshot(snapshot)
+                except Exception as e:
+                    logger.error(f"Erro ao processar snapshot {snapshot.original_url}: {e}")
+                finally:
+                    if snapshot is not None:
+                        progress.update(1)
+                    queue.task_done()
+        
+        # Total desconhecido de antemão: a barra usa o limite de páginas, se houver
+        with timing("Busca, download e processamento de snapshots"), \
+                tqdm(total=self.max_pages, desc="Baixando snapshots") as progress:
+            workers = [asyncio.create_task(worker(progress)) for _ in range(pipeline_workers)]
+            
+            stream = snapshot_fetcher.fetch_snapshots_stream()
+            try:
+                async for snapshot in stream:
+                    await queue.put(snapshot)
+                    submitted_snapshots += 1
+                    if self.max_pages and submitted_snapshots >= self.max_pages:
+                        logger.info(f"Limite de snapshots atingido ({self.max_pages})")
+                        break
+            finally:
+                await stream.aclose()
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+        
+        if not submitted_snapshots:
+            logger.error("Não foi possível encontrar snapshots. Abortando.")
+            return
+        
+        logger.info(f"Downloads concluídos. {self.stats.snapshots_processed} de {submitted_snapshots} snapshots foram baixados e processados com sucesso.")
+        
+        # 3. Baixar recursos
+        with timing("Download de recursos"):
+            await self.resource_manager.download_all_resources(self.stats)
+        
+        # Atualizar estatísticas finais
+        self.stats.update()
+        logger.info(f"Estatísticas finais: {self.stats}")
+        
+        # 4. Criar índice
+        with timing("Criação de índice"):
+            await self.index_builder.create_index()
+            
+        logger.info(f"Extração concluída! Arquivos salvos em: {self.output_dir.absolute()}")
+        
+        # 5. Empacotar a saída num único arquivo, se solicitado
+        if self.zip_path is not None:
+            with timing("Compactação da saída"):
+                loop = asyncio.get_running_loop()
+                count = await loop.run_in_executor(None, write_zip_archive, self.output_dir, self.zip_path)
+            logger.info(f"{count} arquivos compactados em: {self.zip_path}")
 
 async def main_async():
     parser = argparse.ArgumentParser(description="Kali Archive - Extrator avançado e reconstrutor de sites via Wayback Machine")
@@ -1507,6 +2267,10 @@ async def main_async():
                         help=f"Timeout para requisições em segundos (padrão: {REQUEST_TIMEOUT})")
     parser.add_argument("--no-auto-detect", action="store_true",
                         help="Desativar detecção automática de data inicial")
+    parser.add_argument("--cdx-ttl", type=int, default=CDX_CACHE_TTL_HOURS,
+                        help=f"Horas de validade das listagens do CDX em cache; 0 desativa (padrão: {CDX_CACHE_TTL_HOURS})")
+    parser.add_argument("--zip", action="store_true",
+                        help="Ao final, empacotar a saída num único arquivo .zip ao lado do diretório")
     
     args = parser.parse_args()
     
@@ -1521,27 +2285,31 @@ async def main_async():
         cache_enabled=not args.no_cache,
         memory_safe=args.safe_memory,
         auto_detect_date=not args.no_auto_detect,
-        timeout=args.timeout
+        timeout=args.timeout,
+        cdx_ttl_hours=args.cdx_ttl,
+        zip_output=args.zip
     )
     
     await archive.run()
 
 def main():
+    log_listener = start_log_listener()
     try:
-        # Configurar detecção de loop de eventos existente
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        # Executar a função assíncrona principal
-        loop.run_until_complete(main_async())
+        # Loop em C do uvloop, quando disponível: menor custo por tarefa no caminho do aiohttp.
+        # O Runner (3.11+) cria o loop só para esta execução, sem trocar a política do processo
+        if HAS_UVLOOP and hasattr(asyncio, "Runner"):
+            with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+                runner.run(main_async())
+        else:
+            asyncio.run(main_async())
     except KeyboardInterrupt:
         logger.info("Interrupção detectada. Encerrando...")
     except Exception as e:
         logger.error(f"Erro fatal: {e}")
         sys.exit(1)
+    finally:
+        # Esvazia a fila antes de sair, para não perder as últimas mensagens
+        log_listener.stop()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -13,27 +13,34 @@ if sys.version_info < (3, 7):
 if not os.path.exists('kali_archive.py'):
     sys.exit('Erro: kali_archive.py não encontrado')
 
-# Extrair versão ou usar valor padrão
-def get_version():
+# Padrões aplicados ao código-fonte, que é lido uma única vez
+VERSION_RE = re.compile(r'__version__\s*=\s*[\'"]([^\'"]*)[\'"]')
+FALLBACK_TEMPLATE_RE = re.compile(r'def _get_fallback_template.*?return \"\"\"(.*?)\"\"\"\s*$',
+                                  re.DOTALL | re.MULTILINE)
+
+def read_source():
     try:
         with open('kali_archive.py', 'r', encoding='utf-8') as f:
-            content = f.read()
-            match = re.search(r'__version__\s*=\s*[\'"]([^\'"]*)[\'"]', content)
-            return match.group(1) if match else "1.0.0"
+            return f.read()
+    except Exception:
+        return None
+
+# Extrair versão ou usar valor padrão
+def get_version(content):
+    try:
+        match = VERSION_RE.search(content)
+        return match.group(1) if match else "1.0.0"
     except Exception:
         return "1.0.0"
 
 # Garantir que template existe
-def ensure_template():
+def ensure_template(content):
     if not os.path.exists('index_template.html'):
         try:
-            with open('kali_archive.py', 'r', encoding='utf-8') as f:
-                content = f.read()
-                match = re.search(r'def _get_fallback_template.*?return \"\"\"(.*?)\"\"\"\s*$', 
-                                 content, re.DOTALL | re.MULTILINE)
-                if match:
-                    with open('index_template.html', 'w', encoding='utf-8') as tf:
-                        tf.write(match.group(1))
+            match = FALLBACK_TEMPLATE_RE.search(content)
+            if match:
+                with open('index_template.html', 'w', encoding='utf-8') as tf:
+                    tf.write(match.group(1))
         except Exception:
             # Criar template vazio caso falhe
             with open('index_template.html', 'w', encoding='utf-8') as f:
@@ -48,16 +55,17 @@ def get_requirements():
     except FileNotFoundError:
         return [
             'aiohttp>=3.8.1', 'aiofiles>=0.8.0', 'beautifulsoup4>=4.10.0', 
-            'requests>=2.27.1', 'urllib3>=1.26.9', 'tqdm>=4.64.0', 
-            'psutil>=5.9.0', 'diskcache>=5.4.0', 'lxml>=4.8.0', 
+            'tqdm>=4.64.0', 'psutil>=5.9.0', 'diskcache>=5.4.0', 
+            'orjson>=3.6.0', 'lxml>=4.8.0', 
             'bs4>=0.0.1', 'asyncio>=3.4.3'
         ]
 
-ensure_template()
+source = read_source()
+ensure_template(source)
 
 setup(
     name="kali-archive",
-    version=get_version(),
+    version=get_version(source),
     description="Ferramenta de extração e reconstrução de conteúdo web histórico",
     author="Kali Archive Team",
     py_modules=["kali_archive"],